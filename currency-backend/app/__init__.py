@@ -2,9 +2,17 @@ from __future__ import annotations
 
 from flask import Flask, jsonify
 
+from .commands import rates_cli
 from .config import get_config
 from .extensions import db, init_redis
+from .json_provider import FastJSONProvider
 from .routes import api_bp
+from .services.circuit_breaker import CircuitOpen, upstream_breaker
+from .services.local_cache import snapshot_cache
+from .services.passwords import HashingBusy, password_hasher
+from .services.pubsub import pubsub_listener
+from .services.quota import QuotaExhausted, quota_budget
+from .services.snapshot_writer import snapshot_writer
 from flasgger import Swagger
 
 
@@ -12,14 +20,25 @@ def create_app(config_name: str | None = None) -> Flask:
     """Application factory for the currency tracking backend."""
     app = Flask(__name__)
     app.config.from_object(get_config(config_name))
+    app.json = FastJSONProvider(app)
+    # Clients never rely on key order; sorting only costs time on big payloads.
+    app.json.sort_keys = False
 
     db.init_app(app)
     init_redis(app)
-    Swagger(app, config={"headers": []})
+    snapshot_writer.init_app(app)
+    pubsub_listener.init_app(app)
+    snapshot_cache.init_app(app)
+    quota_budget.init_app(app)
+    upstream_breaker.init_app(app)
+    password_hasher.init_app(app)
+    # Flasgger replaces rather than merges a partial config, which drops its specs.
+    Swagger(app, config={**Swagger.DEFAULT_CONFIG, "headers": []})
 
     register_blueprints(app)
     register_error_handlers(app)
     register_shellcontext(app)
+    register_commands(app)
 
     with app.app_context():
         db.create_all()
@@ -36,11 +55,33 @@ def register_error_handlers(app: Flask) -> None:
     def not_found(error):  # type: ignore[override]
         return jsonify({"message": "Not found"}), 404
 
+    @app.errorhandler(QuotaExhausted)
+    def quota_exhausted(error: QuotaExhausted):
+        response = jsonify({"message": "Upstream quota exhausted"})
+        response.headers["Retry-After"] = str(error.retry_after)
+        return response, 503
+
+    @app.errorhandler(CircuitOpen)
+    def circuit_open(error: CircuitOpen):
+        response = jsonify({"message": "Rate source unavailable"})
+        response.headers["Retry-After"] = str(error.retry_after)
+        return response, 503
+
+    @app.errorhandler(HashingBusy)
+    def hashing_busy(error: HashingBusy):
+        response = jsonify({"message": "Server busy, retry shortly"})
+        response.headers["Retry-After"] = "1"
+        return response, 503
+
     @app.errorhandler(500)
     def server_error(error):  # type: ignore[override]
         return jsonify({"message": "Unexpected server error"}), 500
 
 
+def register_commands(app: Flask) -> None:
+    app.cli.add_command(rates_cli)
+
+
 def register_shellcontext(app: Flask) -> None:
     @app.shell_context_processor
     def make_shell_context():
@@ -1,56 +1,192 @@
 from __future__ import annotations
 
 import secrets
+import threading
+import time
+from collections import OrderedDict
 from typing import Optional
 
-from flask import current_app, request
+from flask import current_app, g, jsonify, request
 
-from .extensions import redis_client
+from .extensions import get_redis
+from .services.pubsub import pubsub_listener
 
 TOKEN_PREFIX = "auth:token:"
+# Revoked token keys are published here so every worker drops its cached copy.
+REVOCATIONS_CHANNEL = "auth:revocations"
 
 
 def _token_key(token: str) -> str:
     return f"{TOKEN_PREFIX}{token}"
 
 
+class TokenCache:
+    """Short-lived, bounded in-process map of token key -> user id.
+
+    Entries never outlive ``AUTH_TOKEN_CACHE_SECONDS`` nor the token's own
+    Redis TTL, and are evicted in every worker as soon as a revocation is
+    published, so logging out takes effect without waiting for expiry.
+
+    Nothing is cached unless this worker's revocation subscription is
+    confirmed, and the cache is emptied whenever it is (re)established or
+    lost, since revocations published meanwhile are never delivered. A lookup
+    that raced a revocation or reset is not cached either: :meth:`put` takes
+    the :meth:`generation` read before Redis was consulted.
+    """
+
+    def __init__(self) -> None:
+        self._entries: OrderedDict[str, tuple[int, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._subscribed = False
+
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key: str) -> Optional[int]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user_id, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user_id
+
+    def put(self, key: str, user_id: int, ttl_seconds: float, generation: int) -> None:
+        max_entries = current_app.config["AUTH_TOKEN_CACHE_MAX_ENTRIES"]
+        ttl_seconds = min(ttl_seconds, current_app.config["AUTH_TOKEN_CACHE_SECONDS"])
+        if max_entries <= 0 or ttl_seconds <= 0:
+            return
+        if not pubsub_listener.is_live(REVOCATIONS_CHANNEL):
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = (user_id, time.monotonic() + ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def evict(self, key: str) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def subscribe(self) -> None:
+        """Start listening for revocations; cheap to call on every request."""
+        if self._subscribed:
+            pubsub_listener.ensure_running()
+            return
+        with self._lock:
+            if self._subscribed:
+                return
+            self._subscribed = True
+        pubsub_listener.subscribe(REVOCATIONS_CHANNEL, self.evict, on_reset=self.clear)
+
+
+token_cache = TokenCache()
+
+
 def issue_token(user_id: int) -> str:
+    redis_client = get_redis()
     if not redis_client:
         raise RuntimeError("Redis is not configured; cannot issue auth tokens.")
     token = secrets.token_urlsafe(32)
-    redis_client.setex(
-        _token_key(token),
-        current_app.config["SESSION_TTL_SECONDS"],
-        str(user_id),
-    )
+    ttl = current_app.config["SESSION_TTL_SECONDS"]
+    generation = token_cache.generation()
+    redis_client.setex(_token_key(token), ttl, str(user_id))
+    token_cache.put(_token_key(token), user_id, ttl, generation)
     return token
 
 
 def revoke_token(token: str) -> None:
+    key = _token_key(token)
+    token_cache.evict(key)
+    redis_client = get_redis()
     if redis_client:
-        redis_client.delete(_token_key(token))
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.delete(key)
+        pipe.publish(REVOCATIONS_CHANNEL, key)
+        pipe.execute()
 
 
 def resolve_token(token: str) -> Optional[int]:
+    """Return the user id behind ``token``, or ``None`` if it is not valid.
+
+    Served from the in-process cache when possible. On a Redis lookup the
+    session slides: once less than ``SESSION_RENEW_BELOW_SECONDS`` remain,
+    the TTL is reset to ``SESSION_TTL_SECONDS``. Renewal therefore costs
+    one write per token per renewal window, not one per request.
+    """
+    key = _token_key(token)
+    cached = token_cache.get(key)
+    if cached is not None:
+        return cached
+
+    redis_client = get_redis()
     if not redis_client:
         return None
-    user_id = redis_client.get(_token_key(token))
+    generation = token_cache.generation()
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.get(key)
+    pipe.ttl(key)
+    user_id, remaining = pipe.execute()
     if user_id is None:
         return None
     try:
-        return int(user_id)
+        user_id = int(user_id)
     except ValueError:
         return None
 
+    config = current_app.config
+    if 0 <= remaining < config["SESSION_RENEW_BELOW_SECONDS"]:
+        remaining = config["SESSION_TTL_SECONDS"]
+        redis_client.expire(key, remaining)
+    if remaining >= 0:
+        token_cache.put(key, user_id, remaining, generation)
+    return user_id
 
-def extract_bearer_token() -> Optional[str]:
+
+def extract_bearer_token(allow_body: bool = False) -> Optional[str]:
     header = request.headers.get("Authorization", "")
     if header.startswith("Bearer "):
         return header.split(" ", 1)[1].strip()
-    # fallback to JSON payload if necessary
+    # Only parse the body where a token may actually be sent in it.
+    if not allow_body or not request.is_json:
+        return None
     payload = request.get_json(silent=True) or {}
     token = payload.get("token")
     if isinstance(token, str):
         return token
     return None
 
+
+def authenticate_request():
+    """Blueprint ``before_request`` hook: resolve the bearer token once.
+
+    Stores the caller's user id (or ``None``) in ``g.user_id`` for the
+    views. With ``AUTH_REQUIRED`` on, routes scoped to a ``user_id`` are
+    rejected unless the token belongs to that user.
+    """
+    token_cache.subscribe()
+    token = extract_bearer_token()
+    g.user_id = resolve_token(token) if token else None
+
+    if not current_app.config["AUTH_REQUIRED"] or request.method == "OPTIONS":
+        return None
+    owner = (request.view_args or {}).get("user_id")
+    if owner is None:
+        return None
+    if g.user_id is None:
+        return jsonify({"message": "Authentication required"}), 401
+    if g.user_id != owner:
+        return jsonify({"message": "Forbidden"}), 403
+    return None
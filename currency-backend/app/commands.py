@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from .services.rate_history import parse_timestamp
+from .services.rate_maintenance import (
+    compact_raw,
+    ensure_partitions,
+    partition_table,
+    prune_rollups,
+)
+from .services.rate_rollups import backfill_rollups
+
+rates_cli = AppGroup("rates", help="Rate history maintenance commands.")
+
+
+def _timestamp_option(value: str | None) -> datetime | None:
+    if value is None:
+        return None
+    try:
+        return parse_timestamp(value)
+    except ValueError as exc:
+        raise click.BadParameter(str(exc)) from None
+
+
+@rates_cli.command("backfill-rollups")
+@click.option("--from", "start", help="ISO 8601 start; defaults to the oldest snapshot.")
+@click.option("--to", "end", help="ISO 8601 end; defaults to the newest snapshot.")
+def backfill_rollups_command(start: str | None, end: str | None) -> None:
+    """Rebuild minute/hour/day rollups from raw rate snapshots."""
+    written = backfill_rollups(_timestamp_option(start), _timestamp_option(end))
+    click.echo(f"Wrote {written} rollup rows.")
+
+
+@rates_cli.command("compact")
+@click.option(
+    "--older-than-days",
+    type=int,
+    help="Compact raw snapshots older than this; defaults to RATE_RAW_RETENTION_DAYS.",
+)
+def compact_command(older_than_days: int | None) -> None:
+    """Roll old raw snapshots into rollups, delete them and prune rollups."""
+    config = current_app.config
+    days = config["RATE_RAW_RETENTION_DAYS"] if older_than_days is None else older_than_days
+    ensure_partitions(config["RATE_PARTITION_MONTHS_AHEAD"])
+    removed = compact_raw(datetime.utcnow() - timedelta(days=days))
+    pruned = prune_rollups(
+        {"1m": config["ROLLUP_1M_RETENTION_DAYS"], "1h": config["ROLLUP_1H_RETENTION_DAYS"]}
+    )
+    click.echo(f"Removed {removed} raw rows and {pruned} expired rollup rows.")
+
+
+@rates_cli.command("partition-table")
+def partition_table_command() -> None:
+    """Convert currency_rates into monthly range partitions (PostgreSQL only)."""
+    try:
+        partition_table(current_app.config["RATE_PARTITION_MONTHS_AHEAD"])
+    except RuntimeError as exc:
+        raise click.ClickException(str(exc)) from None
+    click.echo("currency_rates is partitioned by month.")
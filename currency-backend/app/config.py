@@ -36,12 +36,63 @@ class Config:
     REDIS_URL = require_env("REDIS_URL")
     FREECURRENCY_API_URL = require_env("FREECURRENCY_API_URL")
     FREECURRENCY_API_KEY = require_env("FREECURRENCY_API_KEY")
+    UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "3.05"))
+    UPSTREAM_READ_TIMEOUT = float(os.getenv("UPSTREAM_READ_TIMEOUT", "10"))
+    UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", "2"))
+    UPSTREAM_RETRY_BACKOFF = float(os.getenv("UPSTREAM_RETRY_BACKOFF", "0.3"))
+    UPSTREAM_POOL_SIZE = int(os.getenv("UPSTREAM_POOL_SIZE", "10"))
+    UPSTREAM_QUOTA_PER_MINUTE = int(os.getenv("UPSTREAM_QUOTA_PER_MINUTE", "0"))
+    UPSTREAM_QUOTA_PER_MONTH = int(os.getenv("UPSTREAM_QUOTA_PER_MONTH", "0"))
+    QUOTA_STATE_REFRESH_SECONDS = float(os.getenv("QUOTA_STATE_REFRESH_SECONDS", "5"))
+    BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+    BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+    BREAKER_SLOW_CALL_SECONDS = float(os.getenv("BREAKER_SLOW_CALL_SECONDS", "5"))
+    BREAKER_SERVE_PERSISTED = os.getenv("BREAKER_SERVE_PERSISTED", "true").lower() in ("1", "true", "yes")
     RATE_CACHE_TTL = int(require_env("RATE_CACHE_TTL"))
+    RATE_CACHE_HARD_TTL = int(os.getenv("RATE_CACHE_HARD_TTL", "600"))
+    RATE_L1_MAX_ENTRIES = int(os.getenv("RATE_L1_MAX_ENTRIES", "256"))
+    SNAPSHOT_WRITER_ASYNC = True
+    SNAPSHOT_FLUSH_SIZE = int(os.getenv("SNAPSHOT_FLUSH_SIZE", "500"))
+    SNAPSHOT_FLUSH_INTERVAL_SECONDS = float(os.getenv("SNAPSHOT_FLUSH_INTERVAL_SECONDS", "2"))
+    SNAPSHOT_BUFFER_MAX_ROWS = int(os.getenv("SNAPSHOT_BUFFER_MAX_ROWS", "50000"))
+    STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", "15"))
+    MATRIX_MAX_CURRENCIES = int(os.getenv("MATRIX_MAX_CURRENCIES", "200"))
+    CONVERT_MAX_ITEMS = int(os.getenv("CONVERT_MAX_ITEMS", "10000"))
+    HISTORY_MAX_BUCKETS = int(os.getenv("HISTORY_MAX_BUCKETS", "5000"))
+    WATCHLIST_PAGE_SIZE = int(os.getenv("WATCHLIST_PAGE_SIZE", "100"))
+    WATCHLIST_MAX_PAGE_SIZE = int(os.getenv("WATCHLIST_MAX_PAGE_SIZE", "1000"))
+    BULK_MAX_PAIRS = int(os.getenv("BULK_MAX_PAIRS", "1000"))
+    FAVORITES_CACHE_TTL = int(os.getenv("FAVORITES_CACHE_TTL", "3600"))
+    ETAG_VERSION_TTL_SECONDS = int(os.getenv("ETAG_VERSION_TTL_SECONDS", "86400"))
+    RATE_RAW_RETENTION_DAYS = int(os.getenv("RATE_RAW_RETENTION_DAYS", "7"))
+    ROLLUP_1M_RETENTION_DAYS = int(os.getenv("ROLLUP_1M_RETENTION_DAYS", "30"))
+    ROLLUP_1H_RETENTION_DAYS = int(os.getenv("ROLLUP_1H_RETENTION_DAYS", "730"))
+    RATE_PARTITION_MONTHS_AHEAD = int(os.getenv("RATE_PARTITION_MONTHS_AHEAD", "3"))
     SESSION_TTL_SECONDS = int(require_env("SESSION_TTL_SECONDS"))
+    SESSION_RENEW_BELOW_SECONDS = int(
+        os.getenv("SESSION_RENEW_BELOW_SECONDS", str(SESSION_TTL_SECONDS // 2))
+    )
+    AUTH_TOKEN_CACHE_SECONDS = float(os.getenv("AUTH_TOKEN_CACHE_SECONDS", "30"))
+    AUTH_TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_TOKEN_CACHE_MAX_ENTRIES", "10000"))
+    AUTH_REQUIRED = os.getenv("AUTH_REQUIRED", "false").lower() in ("1", "true", "yes")
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt")
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", "32"))
+    PASSWORD_HASH_TIMEOUT_SECONDS = float(os.getenv("PASSWORD_HASH_TIMEOUT_SECONDS", "10"))
     DEFAULT_BASE = require_env("DEFAULT_BASE")
     DEFAULT_SYMBOLS = [
         symbol.strip().upper() for symbol in require_env("DEFAULT_SYMBOLS").split(",")
     ]
+    RATE_PIVOT = os.getenv("RATE_PIVOT", "USD").strip().upper()
+    RATE_TRIANGULATION = os.getenv("RATE_TRIANGULATION", "true").lower() in ("1", "true", "yes")
+    RATE_FETCH_MAX_WORKERS = int(os.getenv("RATE_FETCH_MAX_WORKERS", "8"))
+    RATE_REQUEST_DEADLINE_SECONDS = float(os.getenv("RATE_REQUEST_DEADLINE_SECONDS", "5"))
+    RATE_FETCH_LOCK_SECONDS = float(os.getenv("RATE_FETCH_LOCK_SECONDS", "10"))
+    RATE_REFRESH_LEAD_SECONDS = int(os.getenv("RATE_REFRESH_LEAD_SECONDS", "5"))
+    RATE_REFRESH_INTERVAL_SECONDS = float(os.getenv("RATE_REFRESH_INTERVAL_SECONDS", "1"))
+    RATE_DEMAND_WINDOW_SECONDS = int(os.getenv("RATE_DEMAND_WINDOW_SECONDS", "3600"))
+    RATE_DEMAND_RECORD_SECONDS = float(os.getenv("RATE_DEMAND_RECORD_SECONDS", "10"))
+    RATE_REFRESH_STORED_PAIRS_SECONDS = float(os.getenv("RATE_REFRESH_STORED_PAIRS_SECONDS", "60"))
 
 
 class DevelopmentConfig(Config):
@@ -52,6 +103,8 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
     RATE_CACHE_TTL = 0
+    SNAPSHOT_WRITER_ASYNC = False
+    PASSWORD_HASH_WORKERS = 0
 
 
 class ProductionConfig(Config):
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import hashlib
+import secrets
+import zlib
+from typing import Iterable
+
+from flask import Response, current_app, request
+
+from .extensions import get_redis
+
+VERSION_PREFIX = "version:"
+
+
+def watchlist_version_key() -> str:
+    return f"{VERSION_PREFIX}watchlist"
+
+
+def favorites_version_key(user_id: int) -> str:
+    return f"{VERSION_PREFIX}favorites:{user_id}"
+
+
+def bump_versions(*keys: str) -> None:
+    """Mark the data behind ``keys`` as changed, invalidating issued ETags."""
+    redis_client = get_redis()
+    if not redis_client or not keys:
+        return
+    ttl = current_app.config["ETAG_VERSION_TTL_SECONDS"]
+    pipe = redis_client.pipeline(transaction=False)
+    for key in keys:
+        # A counter lost to a flush or expiry must not restart at 1 and
+        # repeat versions that earlier ETags carried.
+        pipe.set(key, secrets.randbits(48), nx=True, ex=ttl)
+        pipe.incr(key)
+        pipe.expire(key, ttl)
+    pipe.execute()
+
+
+def read_versions(keys: list[str]) -> list[str] | None:
+    """Return the current version of each key, or ``None`` without Redis.
+
+    Missing counters are seeded with a random value instead of starting at
+    zero, so ETags issued before a Redis flush can never match again. Every
+    counter expires after ``ETAG_VERSION_TTL_SECONDS`` without writes, so
+    reads for ids that do not exist cannot pile up keys.
+    """
+    redis_client = get_redis()
+    if not redis_client:
+        return None
+    versions = redis_client.mget(keys)
+    missing = [key for key, version in zip(keys, versions) if version is None]
+    if missing:
+        ttl = current_app.config["ETAG_VERSION_TTL_SECONDS"]
+        pipe = redis_client.pipeline(transaction=False)
+        for key in missing:
+            pipe.set(key, secrets.randbits(48), nx=True, ex=ttl)
+        pipe.execute()
+        versions = redis_client.mget(keys)
+    return versions
+
+
+def build_etag(prefix: str, keys: Iterable[str], vary_on_query: bool = False) -> str | None:
+    """Build a strong ETag from version counters, ``None`` if unavailable."""
+    return format_etag(prefix, read_versions(list(keys)), vary_on_query)
+
+
+def format_etag(
+    prefix: str, versions: list[str] | None, vary_on_query: bool = False
+) -> str | None:
+    """Build a strong ETag from versions already read with :func:`read_versions`."""
+    if versions is None:
+        return None
+    parts = [prefix, *versions]
+    if vary_on_query:
+        parts.append(format(zlib.crc32(request.query_string), "x"))
+    return "-".join(parts)
+
+
+def digest_etag(prefix: str, parts: Iterable[str], vary_on_query: bool = False) -> str:
+    """Build an ETag from values that identify the served data."""
+    tag = [prefix, hashlib.blake2b("\n".join(parts).encode(), digest_size=8).hexdigest()]
+    if vary_on_query:
+        tag.append(format(zlib.crc32(request.query_string), "x"))
+    return "-".join(tag)
+
+
+def not_modified(etag: str | None, weak: bool = False) -> Response | None:
+    """Return a bare 304 if the client already holds ``etag``.
+
+    ``weak`` tags validate bodies that are equivalent but not byte-identical.
+    """
+    if etag is None:
+        return None
+    matches = request.if_none_match.contains_weak if weak else request.if_none_match.contains
+    if not matches(etag):
+        return None
+    response = Response(status=304)
+    response.set_etag(etag, weak=weak)
+    return response
+
+
+def with_etag(response: Response, etag: str | None, weak: bool = False) -> Response:
+    if etag is not None:
+        response.set_etag(etag, weak=weak)
+    return response
@@ -1,9 +1,15 @@
 from __future__ import annotations
 
+import os
+import threading
+from typing import Callable, Generic, TypeVar
+
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from redis import Redis
 
+T = TypeVar("T")
+
 db = SQLAlchemy()
 redis_client: Redis | None = None
 
@@ -12,3 +18,48 @@ def init_redis(app: Flask) -> None:
     global redis_client
     redis_client = Redis.from_url(app.config["REDIS_URL"], decode_responses=True)
 
+
+def get_redis() -> Redis | None:
+    # Importing ``redis_client`` directly binds the value from before
+    # ``init_redis`` ran, so callers go through this accessor instead.
+    return redis_client
+
+
+class PerProcess(Generic[T]):
+    """A value built lazily, once per process, by ``factory``.
+
+    Threads, pools and pooled sockets do not survive ``fork``, so every
+    gunicorn worker builds its own on first use rather than inheriting the
+    master's.
+    """
+
+    def __init__(self, factory: Callable[[], T]) -> None:
+        self._factory = factory
+        self._value: T | None = None
+        self._pid: int | None = None
+        self._lock = threading.Lock()
+
+    def get(self) -> T:
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    self._value = self._factory()
+                    self._pid = pid
+        return self._value
+
+    def peek(self) -> T | None:
+        """The value if this process has already built it, else ``None``."""
+        return self._value if self._pid == os.getpid() else None
+
+    def reset(self, stale: T | None = None) -> None:
+        """Drop the value so the next :meth:`get` builds a fresh one.
+
+        With ``stale``, only drop it if it is still that object, so callers
+        racing to replace a broken value do not discard each other's fresh one.
+        """
+        with self._lock:
+            if stale is not None and self._value is not stale:
+                return
+            self._value = None
+            self._pid = None
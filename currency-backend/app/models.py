@@ -7,18 +7,46 @@ from .extensions import db
 
 class CurrencyRate(db.Model):
     __tablename__ = "currency_rates"
+    __table_args__ = (
+        db.Index("ix_currency_rates_pair_fetched_at", "base_currency", "quote_currency", "fetched_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    base_currency = db.Column(db.String(3), nullable=False, index=True)
-    quote_currency = db.Column(db.String(3), nullable=False, index=True)
+    base_currency = db.Column(db.String(3), nullable=False)
+    quote_currency = db.Column(db.String(3), nullable=False)
     rate = db.Column(db.Float, nullable=False)
     fetched_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
 
+class CurrencyRateRollup(db.Model):
+    """OHLC aggregate of raw snapshots for one pair over a fixed time bucket."""
+
+    __tablename__ = "currency_rate_rollups"
+    __table_args__ = (
+        db.UniqueConstraint(
+            "resolution", "base_currency", "quote_currency", "bucket_start", name="uq_rollup_bucket"
+        ),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    resolution = db.Column(db.String(2), nullable=False)
+    base_currency = db.Column(db.String(3), nullable=False)
+    quote_currency = db.Column(db.String(3), nullable=False)
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    open = db.Column(db.Float, nullable=False)
+    high = db.Column(db.Float, nullable=False)
+    low = db.Column(db.Float, nullable=False)
+    close = db.Column(db.Float, nullable=False)
+    count = db.Column(db.Integer, nullable=False)
+    first_at = db.Column(db.DateTime, nullable=False)
+    last_at = db.Column(db.DateTime, nullable=False)
+
+
 class TrackedPair(db.Model):
     __tablename__ = "tracked_pairs"
     __table_args__ = (
         db.UniqueConstraint("base_currency", "quote_currency", name="uq_pair"),
+        db.Index("ix_tracked_pairs_created_at_id", "created_at", "id"),
     )
 
     id = db.Column(db.Integer, primary_key=True)
@@ -1,23 +1,50 @@
 from __future__ import annotations
 
+from datetime import datetime, timedelta
+from queue import Empty
 from typing import Iterable
 
-from flask import Blueprint, current_app, jsonify, request
+import requests
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
 from flasgger import swag_from
-from werkzeug.security import check_password_hash, generate_password_hash
 
-from .auth import extract_bearer_token, issue_token, revoke_token
-from .extensions import db, redis_client
+from .auth import authenticate_request, extract_bearer_token, issue_token, revoke_token
+from .etags import (
+    build_etag,
+    bump_versions,
+    digest_etag,
+    favorites_version_key,
+    format_etag,
+    not_modified,
+    read_versions,
+    watchlist_version_key,
+    with_etag,
+)
+from .extensions import db, get_redis
 from .models import TrackedPair, User, UserFavorite
+from .services.bulk_pairs import delete_pairs, insert_pairs, parse_pair_items
+from .services.circuit_breaker import CircuitOpen, upstream_breaker
+from .services.conversion import convert_amounts
+from .services.favorites import ensure_user_exists, favorite_pairs, load_favorites
+from .services.passwords import HashingBusy, password_hasher
+from .services.quota import QuotaExhausted
+from .services.rate_history import parse_interval, parse_timestamp, query_history
+from .services.rate_matrix import build_matrix
 from .services.rate_provider import RateProvider
+from .services.rate_stream import rate_updates
+from .services.watchlist import list_tracked_pairs
 
 api_bp = Blueprint("api", __name__)
 
 
+api_bp.before_request(authenticate_request)
+
+
 @api_bp.after_request
 def add_cors_headers(response):
     response.headers["Access-Control-Allow-Origin"] = "*"
-    response.headers["Access-Control-Allow-Headers"] = "Content-Type"
+    response.headers["Access-Control-Allow-Headers"] = "Authorization, Content-Type, If-None-Match"
+    response.headers["Access-Control-Expose-Headers"] = "ETag"
     response.headers["Access-Control-Allow-Methods"] = "GET,POST,DELETE,OPTIONS"
     return response
 
@@ -27,15 +54,19 @@ def add_cors_headers(response):
     {
         "responses": {
             200: {
-                "description": "API + Redis health status",
-                "examples": {"application/json": {"status": "ok", "redis": True}},
+                "description": "API, Redis and upstream circuit status",
+                "examples": {
+                    "application/json": {"status": "ok", "redis": True, "upstream": "closed"}
+                },
             }
         }
     }
 )
 def health():
+    redis_client = get_redis()
     redis_ok = bool(redis_client and redis_client.ping())
-    return jsonify({"status": "ok", "redis": redis_ok})
+    upstream = upstream_breaker.state() if redis_ok else "unknown"
+    return jsonify({"status": "ok", "redis": redis_ok, "upstream": upstream})
 
 
 @api_bp.route("/rates", methods=["GET"])
@@ -48,7 +79,15 @@ def health():
                 "type": "string",
                 "required": False,
                 "description": "Comma-separated base:quote pairs e.g. USD:EUR,USD:GBP",
-            }
+            },
+            {
+                "in": "query",
+                "name": "format",
+                "type": "string",
+                "enum": ["rows", "columnar"],
+                "required": False,
+                "description": "`columnar` returns parallel pairs/rates/fetched_at arrays",
+            },
         ],
         "responses": {
             200: {
@@ -61,7 +100,10 @@ def health():
                                 "base": "USD",
                                 "quote": "EUR",
                                 "rate": 0.86,
+                                "source": "direct",
                                 "fetched_at": "2024-05-05T12:00:00Z",
+                                "stale": False,
+                                "age_seconds": 4.2,
                             }
                         ]
                     }
@@ -78,24 +120,414 @@ def get_rates():
         pairs = [(default_base, symbol) for symbol in default_symbols]
 
     provider = RateProvider(current_app.config["RATE_CACHE_TTL"])
-    data = provider.get_rates(pairs)
-    return jsonify({"data": data})
+    try:
+        data = _fetch_rates(provider, pairs)
+    except requests.RequestException:
+        current_app.logger.exception("Upstream rate fetch failed")
+        return jsonify({"message": "Rate source unavailable"}), 502
+
+    # Rates are always resolved first so demand is recorded and stale
+    # snapshots are revalidated; a matching ETag only saves serializing them.
+    # The tag names the snapshots actually served, so it changes with every
+    # fetch and once any snapshot passes its soft TTL. It is weak because
+    # ``age_seconds`` differs between otherwise identical bodies.
+    etag = None
+    freshness = _rates_freshness(data)
+    if freshness is not None:
+        fetched = data["fetched_at"] if isinstance(data, dict) else [
+            item["fetched_at"] for item in data
+        ]
+        etag = digest_etag(f"r{freshness}", fetched, vary_on_query=True)
+    if (cached := not_modified(etag, weak=True)) is not None:
+        return cached
+    return with_etag(jsonify({"data": data}), etag, weak=True)
+
+
+@api_bp.route("/rates/stream", methods=["GET"])
+@swag_from(
+    {
+        "produces": ["text/event-stream"],
+        "parameters": [
+            {
+                "in": "query",
+                "name": "pairs",
+                "type": "string",
+                "required": False,
+                "description": "Comma-separated base:quote pairs e.g. USD:EUR,USD:GBP",
+            }
+        ],
+        "responses": {
+            200: {
+                "description": "Server-Sent Events: an initial `rates` event with every pair, "
+                "then `rates` events carrying only pairs whose rate changed. If the rate "
+                "source is unavailable, a single `error` event with a `retry:` delay ends the stream",
+            }
+        },
+    }
+)
+def stream_rates():
+    pairs = _parse_pairs(request.args.get("pairs"))
+    if not pairs:
+        default_base = current_app.config["DEFAULT_BASE"]
+        default_symbols = current_app.config["DEFAULT_SYMBOLS"]
+        pairs = [(default_base, symbol) for symbol in default_symbols]
+    pairs = list(dict.fromkeys(pairs))
+
+    provider = RateProvider(current_app.config["RATE_CACHE_TTL"])
+    heartbeat = current_app.config["STREAM_HEARTBEAT_SECONDS"]
+
+    def generate():
+        # Subscribe before the initial read so no update slips in between.
+        updates = rate_updates.open()
+        try:
+            try:
+                initial = provider.get_rates(pairs)
+            except requests.RequestException:
+                initial = []
+            except (CircuitOpen, QuotaExhausted) as exc:
+                # Headers are already sent, so say why and end the stream;
+                # the client reconnects once the upstream can be asked again.
+                message = (
+                    "Rate source unavailable"
+                    if isinstance(exc, CircuitOpen)
+                    else "Upstream quota exhausted"
+                )
+                yield _sse_error(message, exc.retry_after)
+                return
+            finally:
+                # A persisted-snapshot fallback checks out a pooled connection;
+                # return it now rather than hold it for the whole stream.
+                db.session.remove()
+            sent = {item["pair"]: item.get("rate") for item in initial}
+            yield _sse_event("rates", initial)
+
+            while True:
+                try:
+                    snapshot_base, snapshot = updates.get(timeout=heartbeat)
+                except Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                changed = []
+                for base, quote in pairs:
+                    if provider.snapshot_base_for(base) != snapshot_base:
+                        continue
+                    quoted = provider.quote_pair(base, quote, snapshot_base, snapshot)
+                    if quoted is not None and sent.get(quoted["pair"]) != quoted["rate"]:
+                        sent[quoted["pair"]] = quoted["rate"]
+                        changed.append(quoted)
+                if changed:
+                    yield _sse_event("rates", changed)
+        finally:
+            rate_updates.close(updates)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@api_bp.route("/rates/matrix", methods=["GET"])
+@swag_from(
+    {
+        "parameters": [
+            {
+                "in": "query",
+                "name": "currencies",
+                "type": "string",
+                "required": True,
+                "description": "Comma-separated currency codes e.g. USD,EUR,GBP",
+            },
+            {
+                "in": "query",
+                "name": "format",
+                "type": "string",
+                "enum": ["nested", "columnar"],
+                "required": False,
+                "description": "`columnar` returns one flat row-major array instead of nested rows",
+            },
+        ],
+        "responses": {
+            200: {
+                "description": "Cross-rate matrix; rates[i][j] is currencies[i]:currencies[j]",
+                "examples": {
+                    "application/json": {
+                        "data": {
+                            "currencies": ["USD", "EUR"],
+                            "rates": [[1.0, 0.86], [1.1628, 1.0]],
+                            "fetched_at": "2024-05-05T12:00:00",
+                            "stale": False,
+                            "age_seconds": 4.2,
+                        }
+                    }
+                },
+            },
+            400: {"description": "Invalid currency list"},
+        },
+    }
+)
+def get_rate_matrix():
+    raw = request.args.get("currencies", "")
+    currencies = [code.strip().upper() for code in raw.split(",") if code.strip()]
+    if not currencies or any(len(code) != 3 for code in currencies):
+        return jsonify({"message": "currencies must be comma-separated 3-letter codes"}), 400
+    max_currencies = current_app.config["MATRIX_MAX_CURRENCIES"]
+    if len(currencies) > max_currencies:
+        return jsonify({"message": f"At most {max_currencies} currencies are allowed"}), 400
+
+    provider = RateProvider(current_app.config["RATE_CACHE_TTL"])
+    try:
+        quoted, matrix, snapshot = build_matrix(provider, currencies)
+    except requests.RequestException:
+        current_app.logger.exception("Upstream rate fetch failed")
+        return jsonify({"message": "Rate source unavailable"}), 502
+
+    age = round(snapshot.age_seconds, 3)
+    payload = {
+        "currencies": quoted,
+        "fetched_at": snapshot.fetched_at.isoformat(),
+        "stale": age > provider.ttl_seconds,
+        "age_seconds": age,
+    }
+    if request.args.get("format") == "columnar":
+        payload["values"] = matrix.ravel().tolist()
+    else:
+        payload["rates"] = matrix.tolist()
+    return jsonify({"data": payload})
+
+
+@api_bp.route("/convert", methods=["POST"])
+@swag_from(
+    {
+        "parameters": [
+            {
+                "in": "body",
+                "name": "payload",
+                "schema": {
+                    "type": "object",
+                    "properties": {
+                        "items": {
+                            "type": "array",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "amount": {"type": "number"},
+                                    "from": {"type": "string"},
+                                    "to": {"type": "string"},
+                                },
+                                "required": ["amount", "from", "to"],
+                            },
+                        },
+                        "amounts": {"type": "array", "items": {"type": "number"}},
+                        "from": {"type": "array", "items": {"type": "string"}},
+                        "to": {"type": "array", "items": {"type": "string"}},
+                    },
+                },
+            }
+        ],
+        "responses": {
+            200: {
+                "description": "Converted amounts in request order; null where a currency is not quoted",
+                "examples": {
+                    "application/json": {
+                        "data": {"converted": [86.0, 117.3]},
+                        "fetched_at": "2024-05-05T12:00:00",
+                    }
+                },
+            },
+            400: {"description": "Invalid payload"},
+        },
+    }
+)
+def convert():
+    data = request.get_json(force=True) or {}
+    columnar = "items" not in data
+    if columnar:
+        amounts = data.get("amounts")
+        sources = data.get("from")
+        targets = data.get("to")
+    else:
+        items = data.get("items")
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            return jsonify({"message": "items must be a list of {amount, from, to} objects"}), 400
+        amounts = [item.get("amount") for item in items]
+        sources = [item.get("from") for item in items]
+        targets = [item.get("to") for item in items]
+
+    if not all(isinstance(column, list) for column in (amounts, sources, targets)):
+        return jsonify({"message": "amounts, from and to must be lists"}), 400
+    if not (len(amounts) == len(sources) == len(targets)) or not amounts:
+        return jsonify({"message": "amounts, from and to must be non-empty and equally long"}), 400
+    max_items = current_app.config["CONVERT_MAX_ITEMS"]
+    if len(amounts) > max_items:
+        return jsonify({"message": f"At most {max_items} conversions per request"}), 400
+    if not all(
+        isinstance(amount, (int, float)) and not isinstance(amount, bool) for amount in amounts
+    ):
+        return jsonify({"message": "amounts must be numbers"}), 400
+    try:
+        sources = [code.upper() for code in sources]
+        targets = [code.upper() for code in targets]
+    except AttributeError:
+        return jsonify({"message": "from and to must be currency codes"}), 400
+    if any(len(code) != 3 for code in (*sources, *targets)):
+        return jsonify({"message": "from and to must be 3-letter currency codes"}), 400
+
+    provider = RateProvider(current_app.config["RATE_CACHE_TTL"])
+    try:
+        converted, snapshot = convert_amounts(provider, amounts, sources, targets)
+    except requests.RequestException:
+        current_app.logger.exception("Upstream rate fetch failed")
+        return jsonify({"message": "Rate source unavailable"}), 502
+
+    if columnar:
+        payload = {"converted": converted}
+    else:
+        payload = [
+            {"amount": amount, "from": source, "to": target, "converted": value}
+            for amount, source, target, value in zip(amounts, sources, targets, converted)
+        ]
+    return jsonify({"data": payload, "fetched_at": snapshot.fetched_at.isoformat()})
+
+
+@api_bp.route("/rates/budget", methods=["GET"])
+@swag_from(
+    {
+        "responses": {
+            200: {"description": "Upstream quota usage and the effective soft TTL in force"}
+        }
+    }
+)
+def get_rate_budget():
+    provider = RateProvider(current_app.config["RATE_CACHE_TTL"])
+    return jsonify({"data": provider.budget_state()})
+
+
+@api_bp.route("/rates/history", methods=["GET"])
+@swag_from(
+    {
+        "parameters": [
+            {
+                "in": "query",
+                "name": "pair",
+                "type": "string",
+                "required": True,
+                "description": "base:quote pair e.g. USD:EUR",
+            },
+            {
+                "in": "query",
+                "name": "from",
+                "type": "string",
+                "required": False,
+                "description": "ISO 8601 start (inclusive), defaults to 24 hours before `to`",
+            },
+            {
+                "in": "query",
+                "name": "to",
+                "type": "string",
+                "required": False,
+                "description": "ISO 8601 end (exclusive), defaults to now",
+            },
+            {
+                "in": "query",
+                "name": "interval",
+                "type": "string",
+                "required": False,
+                "description": "Bucket width such as 5m, 1h or 1d (default 1h)",
+            },
+        ],
+        "responses": {
+            200: {
+                "description": "OHLC buckets for the pair",
+                "examples": {
+                    "application/json": {
+                        "data": [
+                            {
+                                "bucket": "2024-05-05T12:00:00",
+                                "open": 0.861,
+                                "high": 0.864,
+                                "low": 0.859,
+                                "close": 0.862,
+                                "last_fetched_at": "2024-05-05T12:59:31",
+                                "count": 120,
+                            }
+                        ]
+                    }
+                },
+            },
+            400: {"description": "Invalid pair, range or interval"},
+        },
+    }
+)
+def get_rate_history():
+    pairs = _parse_pairs(request.args.get("pair"))
+    if len(pairs) != 1:
+        return jsonify({"message": "pair must be a single base:quote pair"}), 400
+    base, quote = pairs[0]
+
+    try:
+        interval_seconds = parse_interval(request.args.get("interval", "1h"))
+        raw_to = request.args.get("to")
+        end = parse_timestamp(raw_to) if raw_to else datetime.utcnow()
+        raw_from = request.args.get("from")
+        start = parse_timestamp(raw_from) if raw_from else end - timedelta(days=1)
+        buckets = query_history(base, quote, start, end, interval_seconds)
+    except ValueError as exc:
+        return jsonify({"message": str(exc)}), 400
+    return jsonify({"data": buckets})
 
 
 @api_bp.route("/watchlist", methods=["GET"])
-@swag_from({"responses": {200: {"description": "Tracked currency pairs"}}})
+@swag_from(
+    {
+        "parameters": [
+            {
+                "in": "query",
+                "name": "limit",
+                "type": "integer",
+                "required": False,
+                "description": "Page size (default WATCHLIST_PAGE_SIZE)",
+            },
+            {
+                "in": "query",
+                "name": "cursor",
+                "type": "string",
+                "required": False,
+                "description": "`next_cursor` from the previous page",
+            },
+            {"in": "query", "name": "base", "type": "string", "required": False},
+            {"in": "query", "name": "quote", "type": "string", "required": False},
+        ],
+        "responses": {
+            200: {"description": "One page of tracked currency pairs, newest first"},
+            400: {"description": "Invalid limit or cursor"},
+        },
+    }
+)
 def get_watchlist():
-    items = TrackedPair.query.order_by(TrackedPair.created_at.desc()).all()
-    payload = [
-        {
-            "id": item.id,
-            "base": item.base_currency,
-            "quote": item.quote_currency,
-            "created_at": item.created_at.isoformat(),
-        }
-        for item in items
-    ]
-    return jsonify({"data": payload})
+    etag = build_etag("w", [watchlist_version_key()], vary_on_query=True)
+    if (cached := not_modified(etag)) is not None:
+        return cached
+
+    max_limit = current_app.config["WATCHLIST_MAX_PAGE_SIZE"]
+    try:
+        limit = int(request.args.get("limit", current_app.config["WATCHLIST_PAGE_SIZE"]))
+    except ValueError:
+        return jsonify({"message": "limit must be an integer"}), 400
+    if not 1 <= limit <= max_limit:
+        return jsonify({"message": f"limit must be between 1 and {max_limit}"}), 400
+
+    try:
+        items, next_cursor = list_tracked_pairs(
+            limit,
+            cursor=request.args.get("cursor"),
+            base=request.args.get("base", "").upper() or None,
+            quote=request.args.get("quote", "").upper() or None,
+        )
+    except ValueError as exc:
+        return jsonify({"message": str(exc)}), 400
+    payload = [serialize_tracked_pair(item) for item in items]
+    return with_etag(jsonify({"data": payload, "next_cursor": next_cursor}), etag)
 
 
 @api_bp.route("/watchlist", methods=["POST"])
@@ -133,19 +565,68 @@ def add_watchlist_item():
     item = TrackedPair(base_currency=base, quote_currency=quote)
     db.session.add(item)
     db.session.commit()
-    return (
-        jsonify(
-            {
-                "data": {
-                    "id": item.id,
-                    "base": item.base_currency,
-                    "quote": item.quote_currency,
-                    "created_at": item.created_at.isoformat(),
-                }
-            }
-        ),
-        201,
-    )
+    bump_versions(watchlist_version_key())
+    return jsonify({"data": serialize_tracked_pair(item)}), 201
+
+
+_BULK_PAIRS_SPEC = {
+    "parameters": [
+        {
+            "in": "body",
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "pairs": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "base": {"type": "string"},
+                                "quote": {"type": "string"},
+                            },
+                            "required": ["base", "quote"],
+                        },
+                    }
+                },
+                "required": ["pairs"],
+            },
+        }
+    ],
+    "responses": {
+        200: {"description": "Per-pair status in request order"},
+        400: {"description": "Invalid payload"},
+    },
+}
+
+
+@api_bp.route("/watchlist/bulk", methods=["POST"])
+@swag_from(_BULK_PAIRS_SPEC)
+def bulk_add_watchlist_items():
+    try:
+        pairs = _parse_bulk_pairs()
+    except ValueError as exc:
+        return jsonify({"message": str(exc)}), 400
+
+    created = insert_pairs(TrackedPair, pairs)
+    db.session.commit()
+    if created:
+        bump_versions(watchlist_version_key())
+    return jsonify({"data": _bulk_added(pairs, created), "created": len(created)})
+
+
+@api_bp.route("/watchlist/bulk", methods=["DELETE"])
+@swag_from(_BULK_PAIRS_SPEC)
+def bulk_delete_watchlist_items():
+    try:
+        pairs = _parse_bulk_pairs()
+    except ValueError as exc:
+        return jsonify({"message": str(exc)}), 400
+
+    removed = delete_pairs(TrackedPair, pairs)
+    db.session.commit()
+    if removed:
+        bump_versions(watchlist_version_key())
+    return jsonify({"data": _bulk_removed(pairs, removed), "removed": len(removed)})
 
 
 @api_bp.route("/watchlist/<int:item_id>", methods=["DELETE"])
@@ -154,6 +635,7 @@ def delete_watchlist_item(item_id: int):
     item = TrackedPair.query.get_or_404(item_id)
     db.session.delete(item)
     db.session.commit()
+    bump_versions(watchlist_version_key())
     return jsonify({"message": "deleted"})
 
 
@@ -194,7 +676,7 @@ def create_user():
     user = User(
         name=name,
         email=email,
-        password_hash=generate_password_hash(password),
+        password_hash=password_hasher.hash(password),
     )
     db.session.add(user)
     db.session.commit()
@@ -212,9 +694,14 @@ def get_user(user_id: int):
 @api_bp.route("/users/<int:user_id>/favorites", methods=["GET"])
 @swag_from({"responses": {200: {"description": "Favorite currency pairs"}}})
 def get_favorites(user_id: int):
-    user = User.query.get_or_404(user_id)
-    payload = [serialize_favorite(fav) for fav in user.favorites]
-    return jsonify({"data": payload})
+    # One version read serves both the ETag and the cache key of the body.
+    versions = read_versions([favorites_version_key(user_id)])
+    etag = format_etag("f", versions)
+    if (cached := not_modified(etag)) is not None:
+        return cached
+
+    favorites = load_favorites(user_id, version=versions[0] if versions else None)
+    return with_etag(jsonify({"data": favorites}), etag)
 
 
 @api_bp.route("/users/<int:user_id>/favorites", methods=["POST"])
@@ -254,15 +741,49 @@ def add_favorite(user_id: int):
     favorite = UserFavorite(user=user, base_currency=base, quote_currency=quote)
     db.session.add(favorite)
     db.session.commit()
+    bump_versions(favorites_version_key(user_id))
     return jsonify({"data": serialize_favorite(favorite)}), 201
 
 
+@api_bp.route("/users/<int:user_id>/favorites/bulk", methods=["POST"])
+@swag_from(_BULK_PAIRS_SPEC)
+def bulk_add_favorites(user_id: int):
+    user = User.query.get_or_404(user_id)
+    try:
+        pairs = _parse_bulk_pairs()
+    except ValueError as exc:
+        return jsonify({"message": str(exc)}), 400
+
+    created = insert_pairs(UserFavorite, pairs, user_id=user.id)
+    db.session.commit()
+    if created:
+        bump_versions(favorites_version_key(user_id))
+    return jsonify({"data": _bulk_added(pairs, created), "created": len(created)})
+
+
+@api_bp.route("/users/<int:user_id>/favorites/bulk", methods=["DELETE"])
+@swag_from(_BULK_PAIRS_SPEC)
+def bulk_delete_favorites(user_id: int):
+    user = User.query.get_or_404(user_id)
+    try:
+        pairs = _parse_bulk_pairs()
+    except ValueError as exc:
+        return jsonify({"message": str(exc)}), 400
+
+    removed = delete_pairs(UserFavorite, pairs, user_id=user.id)
+    db.session.commit()
+    if removed:
+        bump_versions(favorites_version_key(user_id))
+    return jsonify({"data": _bulk_removed(pairs, removed), "removed": len(removed)})
+
+
 @api_bp.route("/users/<int:user_id>/favorites/<int:fav_id>", methods=["DELETE"])
 @swag_from({ "responses": {200: {"description": "Favorite removed"}}})
 def delete_favorite(user_id: int, fav_id: int):
     favorite = UserFavorite.query.filter_by(id=fav_id, user_id=user_id).first_or_404()
     db.session.delete(favorite)
     db.session.commit()
+    bump_versions(favorites_version_key(user_id))
     return jsonify({"message": "deleted"})
 
 
@@ -289,7 +810,15 @@ def delete_favorite(user_id: int, fav_id: int):
                         "use_favorites": {"type": "boolean"},
                     },
                 },
-            }
+            },
+            {
+                "in": "query",
+                "name": "format",
+                "type": "string",
+                "enum": ["rows", "columnar"],
+                "required": False,
+                "description": "`columnar` returns parallel pairs/rates/fetched_at arrays",
+            },
         ],
         "responses": {
             200: {"description": "Rates calculated for requested/favorite pairs"},
@@ -298,7 +827,6 @@ def delete_favorite(user_id: int, fav_id: int):
     }
 )
 def request_user_rates(user_id: int):
-    user = User.query.get_or_404(user_id)
     data = request.get_json(force=True) or {}
     raw_pairs = data.get("pairs") or []
     use_favorites = data.get("use_favorites", not raw_pairs)
@@ -313,15 +841,20 @@ def request_user_rates(user_id: int):
             pairs.append((base, quote))
 
     if use_favorites:
-        favorite_pairs = [(fav.base_currency, fav.quote_currency) for fav in user.favorites]
-        pairs.extend(favorite_pairs)
+        pairs.extend(favorite_pairs(user_id))
+    else:
+        ensure_user_exists(user_id)
 
     sanitized = list(dict.fromkeys(pairs))  # dedupe / preserve order
     if not sanitized:
         return jsonify({"message": "No valid currency pairs provided"}), 400
 
     provider = RateProvider(current_app.config["RATE_CACHE_TTL"])
-    data = provider.get_rates(sanitized)
+    try:
+        data = _fetch_rates(provider, sanitized)
+    except requests.RequestException:
+        current_app.logger.exception("Upstream rate fetch failed")
+        return jsonify({"message": "Rate source unavailable"}), 502
     return jsonify({"data": data})
 
 
@@ -356,8 +889,9 @@ def login():
         return jsonify({"message": "email and password are required"}), 400
 
     user = User.query.filter_by(email=email).first()
-    if not user or not check_password_hash(user.password_hash, password):
+    if not user or not password_hasher.verify(user.password_hash, password):
         return jsonify({"message": "Invalid credentials"}), 401
+    _upgrade_password_hash(user, password)
 
     token = issue_token(user.id)
     return jsonify({"data": {"token": token, "user": serialize_user(user)}})
@@ -379,7 +913,7 @@ def login():
     }
 )
 def logout():
-    token = extract_bearer_token()
+    token = extract_bearer_token(allow_body=True)
     if not token:
         return jsonify({"message": "Missing bearer token"}), 400
     revoke_token(token)
@@ -404,6 +938,78 @@ def _parse_pairs(raw_pairs: str | None) -> list[tuple[str, str]]:
     return pairs
 
 
+def _fetch_rates(provider: RateProvider, pairs: list[tuple[str, str]]) -> list[dict] | dict:
+    if request.args.get("format") == "columnar":
+        return provider.get_rates_columnar(pairs)
+    return provider.get_rates(pairs)
+
+
+def _parse_bulk_pairs() -> list[tuple[str, str]]:
+    data = request.get_json(force=True) or {}
+    return parse_pair_items(data.get("pairs"), current_app.config["BULK_MAX_PAIRS"])
+
+
+def _bulk_added(pairs: list[tuple[str, str]], created: dict) -> list[dict]:
+    results = []
+    for base, quote in pairs:
+        row = created.get((base, quote))
+        entry = {"base": base, "quote": quote, "status": "created" if row else "duplicate"}
+        if row:
+            entry.update(id=row.id, created_at=row.created_at.isoformat())
+        results.append(entry)
+    return results
+
+
+def _bulk_removed(pairs: list[tuple[str, str]], removed: set) -> list[dict]:
+    return [
+        {"base": base, "quote": quote, "status": "removed" if (base, quote) in removed else "missing"}
+        for base, quote in pairs
+    ]
+
+
+def _upgrade_password_hash(user: User, password: str) -> None:
+    """Re-hash a verified password whose stored hash uses outdated parameters."""
+    try:
+        if not password_hasher.needs_rehash(user.password_hash):
+            return
+        user.password_hash = password_hasher.hash(password)
+    except HashingBusy:
+        # Not worth failing the login over; the next one retries.
+        return
+    db.session.commit()
+
+
+def _rates_freshness(data: list[dict] | dict) -> str | None:
+    """``"s"`` if any rate is stale, ``"f"`` if all are fresh, ``None`` on errors."""
+    if isinstance(data, dict):
+        if "errors" in data:
+            return None
+        stale = data["stale"]
+    else:
+        if any("error" in item for item in data):
+            return None
+        stale = [item["stale"] for item in data]
+    return "s" if any(stale) else "f"
+
+
+def _sse_event(event: str, data: list[dict]) -> str:
+    return f"event: {event}\ndata: {current_app.json.dumps({'data': data})}\n\n"
+
+
+def _sse_error(message: str, retry_after: int) -> str:
+    payload = current_app.json.dumps({"message": message})
+    return f"retry: {retry_after * 1000}\nevent: error\ndata: {payload}\n\n"
+
+
+def serialize_tracked_pair(item: TrackedPair) -> dict:
+    return {
+        "id": item.id,
+        "base": item.base_currency,
+        "quote": item.quote_currency,
+        "created_at": item.created_at.isoformat(),
+    }
+
+
 def serialize_user(user: User) -> dict:
     return {
         "id": user.id,
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Iterable
+
+from sqlalchemy import and_, delete, select, true, tuple_
+
+from ..extensions import db
+from .sql_helpers import dialect_insert
+
+Pair = tuple[str, str]
+
+
+def parse_pair_items(items: Any, max_items: int) -> list[Pair]:
+    """Validate a JSON list of ``{"base", "quote"}`` objects into unique pairs."""
+    if not isinstance(items, list) or not items:
+        raise ValueError("pairs must be a non-empty list")
+    if len(items) > max_items:
+        raise ValueError(f"at most {max_items} pairs per request")
+    pairs: list[Pair] = []
+    for item in items:
+        base = item.get("base") if isinstance(item, dict) else None
+        quote = item.get("quote") if isinstance(item, dict) else None
+        if not (isinstance(base, str) and isinstance(quote, str)) or not (
+            len(base) == 3 and len(quote) == 3
+        ):
+            raise ValueError("base and quote must be 3-letter strings")
+        pairs.append((base.upper(), quote.upper()))
+    return list(dict.fromkeys(pairs))
+
+
+def insert_pairs(model, pairs: list[Pair], **scope: Any) -> dict[Pair, Any]:
+    """Insert ``pairs`` that do not exist yet; return the new rows by pair.
+
+    ``scope`` holds the extra columns of the unique key (e.g. ``user_id``).
+    One ``INSERT ... ON CONFLICT DO NOTHING RETURNING`` where supported,
+    otherwise one lookup followed by one multi-row insert. Duplicates that
+    race in between are left to the unique constraint.
+    """
+    table = model.__table__
+    now = datetime.utcnow()
+    rows = [
+        {**scope, "base_currency": base, "quote_currency": quote, "created_at": now}
+        for base, quote in pairs
+    ]
+    returned = (table.c.id, table.c.base_currency, table.c.quote_currency, table.c.created_at)
+
+    statement = dialect_insert(model)
+    if statement is not None and db.session.get_bind().dialect.insert_returning:
+        statement = statement.values(rows).on_conflict_do_nothing(
+            index_elements=[*scope, "base_currency", "quote_currency"]
+        )
+        result = db.session.execute(statement.returning(*returned))
+    else:
+        existing = set(_existing_pairs(model, pairs, scope))
+        rows = [row for row in rows if (row["base_currency"], row["quote_currency"]) not in existing]
+        if not rows:
+            return {}
+        db.session.execute(table.insert(), rows)
+        result = db.session.execute(
+            select(*returned).where(
+                _scope_filter(model, scope),
+                _pair_filter(model, [(row["base_currency"], row["quote_currency"]) for row in rows]),
+            )
+        )
+    return {(row.base_currency, row.quote_currency): row for row in result}
+
+
+def delete_pairs(model, pairs: list[Pair], **scope: Any) -> set[Pair]:
+    """Delete ``pairs`` within ``scope``; return the pairs that existed."""
+    condition = (_scope_filter(model, scope), _pair_filter(model, pairs))
+    if db.session.get_bind().dialect.delete_returning:
+        result = db.session.execute(
+            delete(model).where(*condition).returning(model.base_currency, model.quote_currency)
+        )
+        return {tuple(row) for row in result}
+    existing = set(_existing_pairs(model, pairs, scope))
+    if existing:
+        db.session.execute(delete(model).where(*condition))
+    return existing
+
+
+def _existing_pairs(model, pairs: list[Pair], scope: dict[str, Any]) -> Iterable[Pair]:
+    result = db.session.execute(
+        select(model.base_currency, model.quote_currency).where(
+            _scope_filter(model, scope), _pair_filter(model, pairs)
+        )
+    )
+    return (tuple(row) for row in result)
+
+
+def _scope_filter(model, scope: dict[str, Any]):
+    return and_(true(), *(getattr(model, column) == value for column, value in scope.items()))
+
+
+def _pair_filter(model, pairs: list[Pair]):
+    return tuple_(model.base_currency, model.quote_currency).in_(pairs)
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import math
+import secrets
+
+from flask import Flask
+
+from ..extensions import get_redis
+
+BREAKER_PREFIX = "breaker:upstream:"
+FAILURES_KEY = f"{BREAKER_PREFIX}failures"
+OPEN_KEY = f"{BREAKER_PREFIX}open"
+PROBE_KEY = f"{BREAKER_PREFIX}probe"
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Only the caller holding the probe lease may drop it early.
+_RELEASE_PROBE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling upstream while the breaker is open."""
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__(f"Upstream circuit open; retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Redis-shared circuit breaker in front of the upstream rate API.
+
+    ``BREAKER_FAILURE_THRESHOLD`` consecutive failures, counting calls slower
+    than ``BREAKER_SLOW_CALL_SECONDS`` as failures, open the circuit for
+    every worker for ``BREAKER_OPEN_SECONDS``. After that the circuit is
+    half-open: a single probe call, leased through Redis, decides whether it
+    closes again or reopens. A threshold of 0 disables the breaker.
+    """
+
+    def __init__(self) -> None:
+        self.failure_threshold = 0
+        self.open_seconds = 30.0
+        self.slow_call_seconds = 0.0
+
+    def init_app(self, app: Flask) -> None:
+        self.failure_threshold = app.config["BREAKER_FAILURE_THRESHOLD"]
+        self.open_seconds = app.config["BREAKER_OPEN_SECONDS"]
+        self.slow_call_seconds = app.config["BREAKER_SLOW_CALL_SECONDS"]
+        app.extensions["circuit_breaker"] = self
+
+    @property
+    def enabled(self) -> bool:
+        return self.failure_threshold > 0
+
+    def state(self) -> str:
+        redis_client = get_redis()
+        if not self.enabled or not redis_client:
+            return CLOSED
+        is_open, failures = self._read(redis_client)
+        return self._classify(is_open, failures)
+
+    def check(self) -> None:
+        """Raise :class:`CircuitOpen` if a call could not go upstream now.
+
+        Takes no probe lease, so callers can run their other admission
+        checks before committing to a call with :meth:`before_call`.
+        """
+        redis_client = get_redis()
+        if not self.enabled or not redis_client:
+            return
+        is_open, failures = self._read(redis_client)
+        state = self._classify(is_open, failures)
+        if state == OPEN or (state == HALF_OPEN and redis_client.exists(PROBE_KEY)):
+            raise CircuitOpen(self.retry_after())
+
+    def before_call(self) -> str | None:
+        """Raise :class:`CircuitOpen` unless this call may go upstream.
+
+        Returns the probe lease token when this call is the half-open probe.
+        :meth:`record` ends the lease; a caller that fails without recording
+        must hand the token to :meth:`release_probe`.
+        """
+        redis_client = get_redis()
+        if not self.enabled or not redis_client:
+            return None
+        is_open, failures = self._read(redis_client)
+        state = self._classify(is_open, failures)
+        if state == CLOSED:
+            return None
+        if state == HALF_OPEN:
+            # The probe lease outlasts the slowest call so only one runs at a time.
+            lease_ms = int(max(self.open_seconds, self.slow_call_seconds) * 1000)
+            token = secrets.token_hex(8)
+            if redis_client.set(PROBE_KEY, token, nx=True, px=lease_ms):
+                return token
+        raise CircuitOpen(self.retry_after())
+
+    def release_probe(self, token: str | None) -> None:
+        """Give up a probe lease without recording an outcome."""
+        redis_client = get_redis()
+        if token is None or not redis_client:
+            return
+        redis_client.eval(_RELEASE_PROBE_SCRIPT, 1, PROBE_KEY, token)
+
+    def record(self, elapsed_seconds: float, ok: bool) -> None:
+        redis_client = get_redis()
+        if not self.enabled or not redis_client:
+            return
+        slow = self.slow_call_seconds > 0 and elapsed_seconds > self.slow_call_seconds
+        if ok and not slow:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.delete(FAILURES_KEY, OPEN_KEY, PROBE_KEY)
+            pipe.execute()
+            return
+
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.incr(FAILURES_KEY)
+        # Failures spread far apart should not add up to an open circuit.
+        pipe.expire(FAILURES_KEY, math.ceil(self.open_seconds * 10))
+        failures = pipe.execute()[0]
+        if failures >= self.failure_threshold:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.set(OPEN_KEY, 1, px=int(self.open_seconds * 1000))
+            pipe.delete(PROBE_KEY)
+            pipe.execute()
+
+    def retry_after(self) -> int:
+        redis_client = get_redis()
+        remaining_ms = redis_client.pttl(OPEN_KEY) if redis_client else -1
+        return max(math.ceil(remaining_ms / 1000), 1)
+
+    def _read(self, redis_client) -> tuple[bool, int]:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.exists(OPEN_KEY)
+        pipe.get(FAILURES_KEY)
+        is_open, failures = pipe.execute()
+        return bool(is_open), int(failures or 0)
+
+    def _classify(self, is_open: bool, failures: int) -> str:
+        if is_open:
+            return OPEN
+        if failures >= self.failure_threshold:
+            return HALF_OPEN
+        return CLOSED
+
+
+upstream_breaker = CircuitBreaker()
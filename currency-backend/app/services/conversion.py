@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import math
+from typing import Sequence
+
+import numpy as np
+
+from .rate_provider import RateProvider, Snapshot
+
+
+def convert_amounts(
+    provider: RateProvider,
+    amounts: Sequence[float],
+    sources: Sequence[str],
+    targets: Sequence[str],
+) -> tuple[list[float | None], Snapshot]:
+    """Convert ``amounts[i]`` from ``sources[i]`` to ``targets[i]`` in one pass.
+
+    Every distinct code is resolved from a single pivot snapshot and the
+    arithmetic is vectorized; codes the pivot does not quote yield ``None``.
+    """
+    codes = sorted(set(sources) | set(targets))
+    snapshot = provider.get_pivot_snapshot(codes)
+    index = {code: position for position, code in enumerate(codes)}
+    vector = np.array([snapshot.rates.get(code, np.nan) for code in codes], dtype=np.float64)
+
+    source_idx = np.fromiter((index[code] for code in sources), dtype=np.intp, count=len(sources))
+    target_idx = np.fromiter((index[code] for code in targets), dtype=np.intp, count=len(targets))
+    values = np.asarray(amounts, dtype=np.float64)
+    converted = values * vector[target_idx] / vector[source_idx]
+    return [None if math.isnan(value) else value for value in converted.tolist()], snapshot
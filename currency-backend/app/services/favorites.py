@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from flask import abort, current_app
+from sqlalchemy import select
+
+from ..etags import favorites_version_key, read_versions
+from ..extensions import db, get_redis
+from ..models import User, UserFavorite
+
+CACHE_PREFIX = "favorites:"
+
+
+def load_favorites(user_id: int, version: str | None = None) -> list[dict]:
+    """Return a user's favorites as serialized rows, aborting 404 for unknown users.
+
+    Rows are cached in Redis under the user's favorites version counter, so
+    every write that bumps the version (and the ETag) also retires the
+    cached list; a reader racing a write can only fill an outdated key.
+    Callers that already read the version for an ETag pass it as
+    ``version`` so the body is loaded for exactly that version.
+    """
+    redis_client = get_redis()
+    if version is None and redis_client:
+        versions = read_versions([favorites_version_key(user_id)])
+        version = versions[0] if versions else None
+    key = f"{CACHE_PREFIX}{user_id}:{version}" if redis_client and version else None
+    if key and (cached := redis_client.get(key)) is not None:
+        return current_app.json.loads(cached)
+
+    result = db.session.execute(
+        select(
+            UserFavorite.id,
+            UserFavorite.base_currency,
+            UserFavorite.quote_currency,
+            UserFavorite.created_at,
+        )
+        .where(UserFavorite.user_id == user_id)
+        .order_by(UserFavorite.id)
+    )
+    favorites = [
+        {
+            "id": row.id,
+            "base": row.base_currency,
+            "quote": row.quote_currency,
+            "created_at": row.created_at.isoformat(),
+        }
+        for row in result
+    ]
+    # Only an empty list is ambiguous between "no favorites" and "no user".
+    if not favorites:
+        ensure_user_exists(user_id)
+    if key:
+        redis_client.set(
+            key, current_app.json.dumps(favorites), ex=current_app.config["FAVORITES_CACHE_TTL"]
+        )
+    return favorites
+
+
+def favorite_pairs(user_id: int) -> list[tuple[str, str]]:
+    return [(favorite["base"], favorite["quote"]) for favorite in load_favorites(user_id)]
+
+
+def ensure_user_exists(user_id: int) -> None:
+    if db.session.scalar(select(User.id).where(User.id == user_id)) is None:
+        abort(404)
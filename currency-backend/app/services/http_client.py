@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import requests
+from flask import current_app
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from ..extensions import PerProcess
+
+
+def build_upstream_session(config) -> requests.Session:
+    """Create a keep-alive session with a bounded pool and retry policy."""
+    retry = Retry(
+        total=config["UPSTREAM_MAX_RETRIES"],
+        # A read timeout already cost the full read budget; retrying it would
+        # multiply the time a worker is blocked during an upstream brownout.
+        read=0,
+        backoff_factor=config["UPSTREAM_RETRY_BACKOFF"],
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset({"GET"}),
+        # An upstream Retry-After can ask for minutes; sleeping on it here
+        # would hold the worker far past its timeouts. The breaker and quota
+        # budget decide when to call again instead.
+        respect_retry_after_header=False,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=config["UPSTREAM_POOL_SIZE"],
+        pool_maxsize=config["UPSTREAM_POOL_SIZE"],
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def worst_case_call_seconds(config) -> float:
+    """Longest one :func:`upstream_get` call can block, retries and backoff included."""
+    attempts = config["UPSTREAM_MAX_RETRIES"] + 1
+    per_attempt = config["UPSTREAM_CONNECT_TIMEOUT"] + config["UPSTREAM_READ_TIMEOUT"]
+    backoff = sum(
+        min(config["UPSTREAM_RETRY_BACKOFF"] * 2 ** retry, Retry.DEFAULT_BACKOFF_MAX)
+        for retry in range(config["UPSTREAM_MAX_RETRIES"])
+    )
+    return attempts * per_attempt + backoff
+
+
+_session: PerProcess[requests.Session] = PerProcess(
+    lambda: build_upstream_session(current_app.config)
+)
+
+
+def get_upstream_session() -> requests.Session:
+    """Return this process's shared upstream session.
+
+    Workers never share pooled sockets with the master or with each other.
+    """
+    return _session.get()
+
+
+def upstream_get(url: str, params: dict) -> requests.Response:
+    config = current_app.config
+    return get_upstream_session().get(
+        url,
+        params=params,
+        timeout=(config["UPSTREAM_CONNECT_TIMEOUT"], config["UPSTREAM_READ_TIMEOUT"]),
+    )
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Any
+
+from flask import Flask
+
+
+class SnapshotCache:
+    """Bounded in-process LRU of rate snapshots, keyed by base currency.
+
+    It sits in front of the Redis hashes and never outlives them: an entry
+    is only served while its snapshot is within the soft TTL, after which
+    the caller falls through to Redis (and its stale-while-revalidate path).
+    Newer snapshots replace older ones, never the other way around, so the
+    order in which local writes and pub/sub updates arrive does not matter.
+    """
+
+    def __init__(self) -> None:
+        self.max_entries = 0
+        self._entries: OrderedDict[str, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app: Flask) -> None:
+        self.max_entries = app.config["RATE_L1_MAX_ENTRIES"]
+        app.extensions["snapshot_cache"] = self
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, base: str, ttl_seconds: float):
+        with self._lock:
+            snapshot = self._entries.get(base)
+            if snapshot is None:
+                return None
+            if snapshot.age_seconds > ttl_seconds:
+                del self._entries[base]
+                return None
+            self._entries.move_to_end(base)
+            return snapshot
+
+    def put(self, base: str, snapshot) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            current = self._entries.get(base)
+            if current is not None and current.fetched_at > snapshot.fetched_at:
+                return
+            self._entries[base] = snapshot
+            self._entries.move_to_end(base)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+snapshot_cache = SnapshotCache()
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, TypeVar
+
+from flask import Flask
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from ..extensions import PerProcess
+
+T = TypeVar("T")
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing pool is saturated or too slow to answer."""
+
+
+class PasswordHasher:
+    """Runs password hashing in a bounded process pool off the request workers.
+
+    Each worker process owns a pool of ``PASSWORD_HASH_WORKERS`` processes.
+    At most ``PASSWORD_HASH_QUEUE_LIMIT`` further jobs wait for a free
+    process. Beyond that, callers get :class:`HashingBusy` at once instead
+    of queueing behind a login burst. With 0 workers, hashing runs inline.
+    """
+
+    def __init__(self) -> None:
+        self.method = "scrypt"
+        self.workers = 0
+        self.queue_limit = 0
+        self.timeout_seconds = 10.0
+        self._pool: PerProcess[tuple[ProcessPoolExecutor, threading.BoundedSemaphore]] = (
+            PerProcess(self._start_pool)
+        )
+        self._method_prefix: str | None = None
+
+    def init_app(self, app: Flask) -> None:
+        self.method = app.config["PASSWORD_HASH_METHOD"]
+        self.workers = app.config["PASSWORD_HASH_WORKERS"]
+        self.queue_limit = app.config["PASSWORD_HASH_QUEUE_LIMIT"]
+        self.timeout_seconds = app.config["PASSWORD_HASH_TIMEOUT_SECONDS"]
+        self._method_prefix = None
+        app.extensions["password_hasher"] = self
+
+    def hash(self, password: str) -> str:
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash: str, password: str) -> bool:
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash: str) -> bool:
+        """Whether ``pwhash`` was made with a method or cost other than the configured one."""
+        if self._method_prefix is None:
+            # Werkzeug expands defaults ("scrypt" -> "scrypt:32768:8:1"), so
+            # learn the canonical prefix from a real hash once.
+            self._method_prefix = self.hash("").split("$", 1)[0]
+        return pwhash.split("$", 1)[0] != self._method_prefix
+
+    def _run(self, fn: Callable[..., T], *args) -> T:
+        if self.workers <= 0:
+            return fn(*args)
+        entry = self._pool.get()
+        pool, slots = entry
+        if not slots.acquire(blocking=False):
+            raise HashingBusy("Password hashing queue is full")
+        try:
+            future: Future = pool.submit(fn, *args)
+        except BaseException as exc:
+            slots.release()
+            if isinstance(exc, BrokenProcessPool):
+                self._replace_pool(entry)
+                raise HashingBusy("Password hashing pool restarted") from None
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=self.timeout_seconds)
+        except FutureTimeout:
+            raise HashingBusy("Password hashing timed out") from None
+        except BrokenProcessPool:
+            self._replace_pool(entry)
+            raise HashingBusy("Password hashing pool restarted") from None
+
+    def _replace_pool(self, entry: tuple[ProcessPoolExecutor, threading.BoundedSemaphore]) -> None:
+        # A child died (OOM kill, crash) and the pool accepts no more work;
+        # drop it so the next call starts a fresh one instead of failing too.
+        self._pool.reset(entry)
+        entry[0].shutdown(wait=False, cancel_futures=True)
+
+    def _start_pool(self) -> tuple[ProcessPoolExecutor, threading.BoundedSemaphore]:
+        # Spawned children start clean instead of inheriting this process's
+        # threads and open Redis/database sockets. They import the entry
+        # module as "__mp_main__", which main.py guards against.
+        pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        return pool, threading.BoundedSemaphore(self.workers + self.queue_limit)
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import defaultdict
+from typing import Callable
+
+from flask import Flask
+from redis.exceptions import RedisError
+
+from ..extensions import PerProcess, get_redis
+
+Handler = Callable[[str], None]
+ResetHook = Callable[[], None]
+
+RECONNECT_DELAY_SECONDS = 1.0
+POLL_TIMEOUT_SECONDS = 1.0
+
+
+class PubSubListener:
+    """Fans Redis pub/sub messages out to in-process handlers.
+
+    Each process holds a single subscription connection read by one thread,
+    however many handlers are registered, so a published message costs one
+    delivery per worker rather than one per consumer.
+
+    Pub/sub does not replay messages sent while a channel is not subscribed.
+    Consumers that must not miss one pass ``on_reset``; it runs whenever
+    Redis confirms a (re)subscription and when the connection drops, so they
+    can discard whatever state those messages would have corrected.
+    """
+
+    def __init__(self) -> None:
+        self.app: Flask | None = None
+        self._handlers: dict[str, list[Handler]] = defaultdict(list)
+        self._resets: dict[str, list[ResetHook]] = defaultdict(list)
+        self._live: set[str] = set()
+        self._lock = threading.Lock()
+        self._thread: PerProcess[threading.Thread] = PerProcess(self._start_thread)
+        self._stale = threading.Event()
+
+    def init_app(self, app: Flask) -> None:
+        self.app = app
+        app.extensions["pubsub_listener"] = self
+
+    def subscribe(self, channel: str, handler: Handler, on_reset: ResetHook | None = None) -> None:
+        with self._lock:
+            self._handlers[channel].append(handler)
+            if on_reset is not None:
+                self._resets[channel].append(on_reset)
+        # The reader thread picks up the new channel on its next poll.
+        self._stale.set()
+        self.ensure_running()
+
+    def unsubscribe(self, channel: str, handler: Handler) -> None:
+        with self._lock:
+            handlers = self._handlers.get(channel, [])
+            if handler in handlers:
+                handlers.remove(handler)
+
+    def is_live(self, channel: str) -> bool:
+        """Whether Redis has confirmed this process's subscription to ``channel``."""
+        return self._thread.peek() is not None and channel in self._live
+
+    def ensure_running(self) -> None:
+        """Start this process's reader thread if it is not running yet."""
+        self._thread.get()
+
+    def _start_thread(self) -> threading.Thread:
+        # Confirmations received by the parent's connection say nothing
+        # about this process's.
+        self._live = set()
+        thread = threading.Thread(target=self._run, name="redis-pubsub", daemon=True)
+        thread.start()
+        return thread
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self._listen()
+            except RedisError:
+                self.app.logger.warning("Pub/sub connection lost; reconnecting")
+            except Exception:
+                # A dead reader would silence every subscriber in this process
+                # for good, so anything unexpected is logged and retried too.
+                self.app.logger.exception("Pub/sub listener failed; reconnecting")
+            time.sleep(RECONNECT_DELAY_SECONDS)
+
+    def _listen(self) -> None:
+        pubsub = get_redis().pubsub()
+        subscribed: set[str] = set()
+        try:
+            while True:
+                if self._stale.is_set() or not subscribed:
+                    self._stale.clear()
+                    with self._lock:
+                        wanted = {channel for channel, handlers in self._handlers.items() if handlers}
+                    if wanted - subscribed:
+                        pubsub.subscribe(*(wanted - subscribed))
+                    if subscribed - wanted:
+                        pubsub.unsubscribe(*(subscribed - wanted))
+                    subscribed = wanted
+                if not subscribed:
+                    time.sleep(POLL_TIMEOUT_SECONDS)
+                    continue
+                message = pubsub.get_message(timeout=POLL_TIMEOUT_SECONDS)
+                if message is None:
+                    continue
+                if message["type"] == "message":
+                    self._dispatch(message["channel"], message["data"])
+                elif message["type"] == "subscribe":
+                    # Also sent again when redis-py reconnects on its own.
+                    self._live.add(message["channel"])
+                    self._reset(message["channel"])
+                elif message["type"] == "unsubscribe":
+                    self._live.discard(message["channel"])
+        finally:
+            lost, self._live = self._live, set()
+            pubsub.close()
+            for channel in lost:
+                self._reset(channel)
+
+    def _reset(self, channel: str) -> None:
+        with self._lock:
+            hooks = list(self._resets.get(channel, []))
+        for hook in hooks:
+            try:
+                hook()
+            except Exception:
+                self.app.logger.exception("Pub/sub reset hook for %s failed", channel)
+
+    def _dispatch(self, channel: str, data: str) -> None:
+        with self._lock:
+            handlers = list(self._handlers.get(channel, []))
+        for handler in handlers:
+            try:
+                handler(data)
+            except Exception:
+                self.app.logger.exception("Pub/sub handler for %s failed", channel)
+
+
+pubsub_listener = PubSubListener()
@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import math
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable
+
+from flask import Flask
+
+from ..extensions import get_redis
+
+QUOTA_PREFIX = "quota:upstream:"
+
+# Take one call from both windows, or neither if either is spent.
+_ACQUIRE_SCRIPT = """
+local minute_limit = tonumber(ARGV[1])
+local month_limit = tonumber(ARGV[2])
+if minute_limit > 0 and tonumber(redis.call('get', KEYS[1]) or '0') >= minute_limit then
+    return 0
+end
+if month_limit > 0 and tonumber(redis.call('get', KEYS[2]) or '0') >= month_limit then
+    return 0
+end
+redis.call('incr', KEYS[1])
+redis.call('expire', KEYS[1], ARGV[3])
+redis.call('incr', KEYS[2])
+redis.call('expire', KEYS[2], ARGV[4])
+return 1
+"""
+
+
+class QuotaExhausted(Exception):
+    """Raised instead of calling upstream once the quota window is spent."""
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__(f"Upstream quota exhausted; retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+@dataclass
+class _Usage:
+    minute_used: int
+    month_used: int
+    active_bases: int
+    read_at: float
+
+
+class QuotaBudget:
+    """Shares the upstream plan's per-minute and monthly call quota across workers.
+
+    Calls are counted in Redis per UTC minute and calendar month and taken
+    atomically before each upstream request. From the remaining budget it
+    derives an effective TTL: the refresh interval at which every actively
+    demanded snapshot base can be kept fresh until the window resets, never
+    shorter than ``RATE_CACHE_TTL`` nor longer than ``RATE_CACHE_HARD_TTL``.
+    A limit of 0 disables that window.
+    """
+
+    def __init__(self) -> None:
+        self.per_minute = 0
+        self.per_month = 0
+        self.state_refresh_seconds = 5.0
+        self._usage: _Usage | None = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app: Flask) -> None:
+        self.per_minute = app.config["UPSTREAM_QUOTA_PER_MINUTE"]
+        self.per_month = app.config["UPSTREAM_QUOTA_PER_MONTH"]
+        self.state_refresh_seconds = app.config["QUOTA_STATE_REFRESH_SECONDS"]
+        app.extensions["quota_budget"] = self
+
+    @property
+    def enabled(self) -> bool:
+        return self.per_minute > 0 or self.per_month > 0
+
+    def try_acquire(self) -> bool:
+        """Count one upstream call; ``False`` if it would exceed the quota."""
+        redis_client = get_redis()
+        if not self.enabled or not redis_client:
+            return True
+        now = datetime.utcnow()
+        minute_key, month_key = self._keys(now)
+        acquired = redis_client.eval(
+            _ACQUIRE_SCRIPT,
+            2,
+            minute_key,
+            month_key,
+            self.per_minute,
+            self.per_month,
+            120,
+            math.ceil(_month_seconds_left(now)) + 86400,
+        )
+        return bool(acquired)
+
+    def retry_after(self) -> int:
+        """Seconds until the exhausted window resets."""
+        now = datetime.utcnow()
+        usage = self._read_usage(None, force=True)
+        if self.per_month > 0 and usage.month_used >= self.per_month:
+            return math.ceil(_month_seconds_left(now))
+        return 60 - now.second
+
+    def headroom(self) -> int | None:
+        """Calls still available in the tighter window, ``None`` if unlimited."""
+        if not self.enabled:
+            return None
+        usage = self._read_usage(None, force=True)
+        remaining = []
+        if self.per_minute > 0:
+            remaining.append(self.per_minute - usage.minute_used)
+        if self.per_month > 0:
+            remaining.append(self.per_month - usage.month_used)
+        return max(min(remaining), 0)
+
+    def effective_ttl(
+        self, ttl_seconds: float, hard_ttl_seconds: float, active_bases: Callable[[], int]
+    ) -> float:
+        """Soft TTL stretched so refreshing ``active_bases`` stays within budget.
+
+        ``active_bases`` is only called when the cached usage is refreshed.
+        """
+        if not self.enabled or not get_redis():
+            return ttl_seconds
+        usage = self._read_usage(active_bases)
+        bases = max(usage.active_bases, 1)
+        interval = float(ttl_seconds)
+        if self.per_minute > 0:
+            interval = max(interval, bases * 60 / self.per_minute)
+        if self.per_month > 0:
+            remaining = self.per_month - usage.month_used
+            if remaining <= 0:
+                return float(max(hard_ttl_seconds, ttl_seconds))
+            interval = max(interval, bases * _month_seconds_left(datetime.utcnow()) / remaining)
+        return min(interval, max(hard_ttl_seconds, ttl_seconds))
+
+    def state(
+        self, ttl_seconds: float, hard_ttl_seconds: float, active_bases: Callable[[], int]
+    ) -> dict:
+        """Budget snapshot for the status endpoint."""
+        if not self.enabled:
+            return {"enabled": False, "effective_ttl_seconds": ttl_seconds}
+        usage = self._read_usage(active_bases, force=True)
+        now = datetime.utcnow()
+        return {
+            "enabled": True,
+            "minute": {
+                "limit": self.per_minute or None,
+                "used": usage.minute_used,
+                "resets_in_seconds": 60 - now.second,
+            },
+            "month": {
+                "limit": self.per_month or None,
+                "used": usage.month_used,
+                "resets_in_seconds": math.ceil(_month_seconds_left(now)),
+            },
+            "active_bases": usage.active_bases,
+            "ttl_seconds": ttl_seconds,
+            "effective_ttl_seconds": round(
+                self.effective_ttl(ttl_seconds, hard_ttl_seconds, active_bases), 3
+            ),
+        }
+
+    def _read_usage(
+        self, active_bases: Callable[[], int] | None, force: bool = False
+    ) -> _Usage:
+        # Cached per process so pricing a request's freshness costs no round trip.
+        with self._lock:
+            usage = self._usage
+            if not force and usage and time.monotonic() - usage.read_at < self.state_refresh_seconds:
+                return usage
+            minute_used, month_used = get_redis().mget(self._keys(datetime.utcnow()))
+            if active_bases is not None:
+                active = active_bases()
+            else:
+                active = usage.active_bases if usage else 0
+            self._usage = _Usage(int(minute_used or 0), int(month_used or 0), active, time.monotonic())
+            return self._usage
+
+    @staticmethod
+    def _keys(now: datetime) -> tuple[str, str]:
+        return (
+            f"{QUOTA_PREFIX}minute:{now:%Y%m%d%H%M}",
+            f"{QUOTA_PREFIX}month:{now:%Y%m}",
+        )
+
+
+def _month_seconds_left(now: datetime) -> float:
+    if now.month == 12:
+        month_end = datetime(now.year + 1, 1, 1)
+    else:
+        month_end = datetime(now.year, now.month + 1, 1)
+    return (month_end - now).total_seconds()
+
+
+quota_budget = QuotaBudget()
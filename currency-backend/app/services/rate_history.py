@@ -0,0 +1,312 @@
+from __future__ import annotations
+
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+from flask import current_app
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import aliased
+
+from ..extensions import db
+from ..models import CurrencyRate, CurrencyRateRollup
+from .rate_rollups import (
+    RESOLUTIONS,
+    bucket_start,
+    rollup_covered_from,
+    rollup_history,
+    rollup_resolution,
+)
+from .sql_helpers import as_datetime, bucket_epoch, greatest, least
+
+_INTERVAL_PATTERN = re.compile(r"^(\d+)([smhd])$")
+_INTERVAL_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+HistoryReader = Callable[[datetime, datetime], list[dict]]
+
+
+def parse_interval(raw: str) -> int:
+    """Parse an interval such as ``30s``, ``5m``, ``1h`` or ``1d`` into seconds."""
+    match = _INTERVAL_PATTERN.match(raw.strip().lower())
+    if not match or int(match.group(1)) == 0:
+        raise ValueError("interval must look like 30s, 5m, 1h or 1d")
+    return int(match.group(1)) * _INTERVAL_UNITS[match.group(2)]
+
+
+def parse_timestamp(raw: str) -> datetime:
+    """Parse an ISO 8601 timestamp into a naive UTC datetime."""
+    try:
+        value = datetime.fromisoformat(raw.strip().replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"invalid timestamp: {raw}") from None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def is_stored_pair(base: str, quote: str) -> bool:
+    """Whether snapshots for the pair are persisted directly rather than derived."""
+    return base == current_app.config["RATE_PIVOT"] or not current_app.config["RATE_TRIANGULATION"]
+
+
+def pair_series(base: str, quote: str, start: datetime, end: datetime):
+    """Subquery of ``(fetched_at, rate)`` observations for a pair.
+
+    Snapshots are stored against the pivot when triangulating, so other
+    pairs are derived by joining the two pivot legs of the same snapshot.
+    """
+    pivot = current_app.config["RATE_PIVOT"]
+    in_range = lambda model: and_(model.fetched_at >= start, model.fetched_at < end)  # noqa: E731
+
+    if is_stored_pair(base, quote):
+        return (
+            select(CurrencyRate.fetched_at, CurrencyRate.rate)
+            .where(
+                CurrencyRate.base_currency == base,
+                CurrencyRate.quote_currency == quote,
+                in_range(CurrencyRate),
+            )
+            .subquery()
+        )
+
+    if quote == pivot:
+        return (
+            select(CurrencyRate.fetched_at, (1.0 / CurrencyRate.rate).label("rate"))
+            .where(
+                CurrencyRate.base_currency == pivot,
+                CurrencyRate.quote_currency == base,
+                in_range(CurrencyRate),
+            )
+            .subquery()
+        )
+
+    base_leg = aliased(CurrencyRate)
+    quote_leg = aliased(CurrencyRate)
+    return (
+        select(quote_leg.fetched_at, (quote_leg.rate / base_leg.rate).label("rate"))
+        .join(
+            base_leg,
+            and_(
+                base_leg.fetched_at == quote_leg.fetched_at,
+                base_leg.base_currency == pivot,
+                base_leg.quote_currency == base,
+            ),
+        )
+        .where(
+            quote_leg.base_currency == pivot,
+            quote_leg.quote_currency == quote,
+            in_range(quote_leg),
+        )
+        .subquery()
+    )
+
+
+def stored_legs(base: str, quote: str) -> list[tuple[str, str]]:
+    """The persisted pairs a pair's history is read from."""
+    pivot = current_app.config["RATE_PIVOT"]
+    if is_stored_pair(base, quote):
+        return [(base, quote)]
+    if quote == pivot:
+        return [(pivot, base)]
+    return [(pivot, base), (pivot, quote)]
+
+
+def rollup_series(resolution: str, base: str, quote: str, start: datetime, end: datetime):
+    """Subquery of a pair's ``resolution`` rollup buckets in ``[start, end)``.
+
+    Derived pairs are computed from the buckets of their pivot legs, so
+    their history outlives the raw rows. Inverting the single leg of
+    ``X:pivot`` is exact. A cross pair's open and close are exact, since
+    both legs come from the same snapshots, but its high and low come from
+    those opens and closes alone and may understate the true range.
+    """
+    pivot = current_app.config["RATE_PIVOT"]
+
+    def leg(quote_currency: str):
+        rollup = aliased(CurrencyRateRollup)
+        criteria = and_(
+            rollup.resolution == resolution,
+            rollup.base_currency == pivot,
+            rollup.quote_currency == quote_currency,
+        )
+        return rollup, criteria
+
+    if is_stored_pair(base, quote):
+        rollup = CurrencyRateRollup
+        columns = (rollup.open, rollup.high, rollup.low, rollup.close)
+        return (
+            select(rollup.bucket_start, *columns, rollup.count, rollup.last_at)
+            .where(
+                rollup.resolution == resolution,
+                rollup.base_currency == base,
+                rollup.quote_currency == quote,
+                rollup.bucket_start >= start,
+                rollup.bucket_start < end,
+            )
+            .subquery()
+        )
+
+    if quote == pivot:
+        rollup, criteria = leg(base)
+        return (
+            select(
+                rollup.bucket_start,
+                (1.0 / rollup.open).label("open"),
+                (1.0 / rollup.low).label("high"),
+                (1.0 / rollup.high).label("low"),
+                (1.0 / rollup.close).label("close"),
+                rollup.count,
+                rollup.last_at,
+            )
+            .where(criteria, rollup.bucket_start >= start, rollup.bucket_start < end)
+            .subquery()
+        )
+
+    base_leg, base_criteria = leg(base)
+    quote_leg, quote_criteria = leg(quote)
+    open_ = quote_leg.open / base_leg.open
+    close = quote_leg.close / base_leg.close
+    return (
+        select(
+            quote_leg.bucket_start,
+            open_.label("open"),
+            greatest(open_, close).label("high"),
+            least(open_, close).label("low"),
+            close.label("close"),
+            quote_leg.count,
+            quote_leg.last_at,
+        )
+        .join(base_leg, and_(base_criteria, base_leg.bucket_start == quote_leg.bucket_start))
+        .where(quote_criteria, quote_leg.bucket_start >= start, quote_leg.bucket_start < end)
+        .subquery()
+    )
+
+
+def query_history(
+    base: str, quote: str, start: datetime, end: datetime, interval_seconds: int
+) -> list[dict]:
+    """Downsample a pair's history into OHLC buckets, aggregated in the database.
+
+    Pairs are answered from the rollup tables when the interval allows it;
+    any leading part of the range the rollups do not cover yet comes from
+    raw rows.
+    """
+    if end <= start:
+        raise ValueError("from must be earlier than to")
+    max_buckets = current_app.config["HISTORY_MAX_BUCKETS"]
+    if (end - start).total_seconds() / interval_seconds > max_buckets:
+        raise ValueError(f"range spans more than {max_buckets} buckets; widen the interval")
+
+    resolution = rollup_resolution(interval_seconds)
+    if resolution is None:
+        return raw_history(base, quote, start, end, interval_seconds)
+
+    def from_raw(lower: datetime, upper: datetime) -> list[dict]:
+        return raw_history(base, quote, lower, upper, interval_seconds)
+
+    def from_rollups(lower: datetime, upper: datetime) -> list[dict]:
+        series = rollup_series(resolution, base, quote, lower, upper)
+        return rollup_history(series, interval_seconds)
+
+    legs = stored_legs(base, quote)
+    if len(legs) > 1:
+        # Cross-pair buckets from rollups understate high and low, so they
+        # only serve the range whose raw rows were compacted away.
+        raw_since = [oldest_raw(*leg) for leg in legs]
+        if None in raw_since:
+            return from_rollups(start, end)
+        # Compaction deletes whole days, so raw rows are complete from the
+        # start of the oldest remaining one's day.
+        kept_from = bucket_start(max(raw_since), RESOLUTIONS["1d"])
+        return _join_at(from_rollups, from_raw, kept_from, start, end, interval_seconds)
+
+    covered_from = rollup_covered_from(resolution, *legs[0])
+    if covered_from is None:
+        return from_raw(start, end)
+    raw_since = oldest_raw(*legs[0])
+    if raw_since is None or raw_since >= covered_from:
+        return from_rollups(start, end)
+    # Raw rows from before rollups existed, not yet backfilled.
+    return _join_at(from_raw, from_rollups, covered_from, start, end, interval_seconds)
+
+
+def oldest_raw(base: str, quote: str) -> datetime | None:
+    """When the oldest raw snapshot still kept for a stored pair was fetched."""
+    oldest = (
+        db.session.query(func.min(CurrencyRate.fetched_at))
+        .filter(CurrencyRate.base_currency == base, CurrencyRate.quote_currency == quote)
+        .scalar()
+    )
+    return as_datetime(oldest) if oldest is not None else None
+
+
+def _join_at(
+    earlier: HistoryReader,
+    later: HistoryReader,
+    boundary: datetime,
+    start: datetime,
+    end: datetime,
+    interval_seconds: int,
+) -> list[dict]:
+    """Read ``[start, end)`` from ``earlier`` before ``boundary`` and ``later`` after it.
+
+    The split is moved up to a bucket boundary so no bucket mixes sources.
+    """
+    split = bucket_start(boundary, interval_seconds)
+    if split < boundary:
+        split += timedelta(seconds=interval_seconds)
+    split = min(max(split, start), end)
+    history = earlier(start, split) if split > start else []
+    if split < end:
+        history += later(split, end)
+    return history
+
+
+def raw_history(
+    base: str, quote: str, start: datetime, end: datetime, interval_seconds: int
+) -> list[dict]:
+    """Downsample a pair's raw observations in ``[start, end)`` into OHLC buckets."""
+    series = pair_series(base, quote, start, end)
+    bucket = bucket_epoch(series.c.fetched_at, interval_seconds).label("bucket")
+    by_bucket = {"partition_by": bucket}
+
+    windowed = select(
+        bucket,
+        series.c.fetched_at,
+        series.c.rate,
+        func.first_value(series.c.rate)
+        .over(order_by=series.c.fetched_at.asc(), **by_bucket)
+        .label("open"),
+        func.first_value(series.c.rate)
+        .over(order_by=series.c.fetched_at.desc(), **by_bucket)
+        .label("close"),
+    ).subquery()
+
+    statement = (
+        select(
+            windowed.c.bucket,
+            func.min(windowed.c.open).label("open"),
+            func.max(windowed.c.rate).label("high"),
+            func.min(windowed.c.rate).label("low"),
+            func.min(windowed.c.close).label("close"),
+            func.max(windowed.c.fetched_at).label("last_fetched_at"),
+            func.count().label("count"),
+        )
+        .group_by(windowed.c.bucket)
+        .order_by(windowed.c.bucket)
+    )
+
+    epoch_start = datetime(1970, 1, 1)
+    return [
+        {
+            "bucket": (epoch_start + timedelta(seconds=row.bucket)).isoformat(),
+            "open": row.open,
+            "high": row.high,
+            "low": row.low,
+            "close": row.close,
+            "last_fetched_at": as_datetime(row.last_fetched_at).isoformat(),
+            "count": row.count,
+        }
+        for row in db.session.execute(statement)
+    ]
+
@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, func, select, text
+
+from ..extensions import db
+from ..models import CurrencyRate, CurrencyRateRollup
+from .rate_rollups import RESOLUTIONS, backfill_rollups, bucket_start
+from .sql_helpers import dialect_name
+
+DELETE_BATCH_SIZE = 10000
+PARTITION_PREFIX = "currency_rates_p"
+
+
+def compact_raw(older_than: datetime) -> int:
+    """Fold raw snapshots older than ``older_than`` into rollups, then drop them.
+
+    The cutoff is rounded down to a whole day so every rollup bucket is
+    built from complete raw data. Returns the number of raw rows deleted;
+    rows in dropped partitions are not counted.
+    """
+    cutoff = bucket_start(older_than, RESOLUTIONS["1d"])
+    oldest = db.session.query(func.min(CurrencyRate.fetched_at)).scalar()
+    if oldest is None or oldest >= cutoff:
+        return 0
+
+    # Rows persisted before rollups existed are only covered once backfilled.
+    backfill_rollups(oldest, cutoff)
+
+    if is_partitioned():
+        dropped = drop_partitions_before(cutoff)
+        if dropped:
+            current_app.logger.info("Dropped partitions %s", ", ".join(dropped))
+
+    removed = 0
+    while True:
+        doomed = select(CurrencyRate.id).where(CurrencyRate.fetched_at < cutoff).limit(
+            DELETE_BATCH_SIZE
+        )
+        result = db.session.execute(delete(CurrencyRate).where(CurrencyRate.id.in_(doomed)))
+        db.session.commit()
+        removed += result.rowcount
+        if result.rowcount < DELETE_BATCH_SIZE:
+            return removed
+
+
+def prune_rollups(retention_days: dict[str, int]) -> int:
+    """Delete rollup rows past each resolution's retention; 0 keeps forever."""
+    now = datetime.utcnow()
+    removed = 0
+    for resolution, days in retention_days.items():
+        if days <= 0:
+            continue
+        result = db.session.execute(
+            delete(CurrencyRateRollup).where(
+                CurrencyRateRollup.resolution == resolution,
+                CurrencyRateRollup.bucket_start < now - timedelta(days=days),
+            )
+        )
+        removed += result.rowcount
+    db.session.commit()
+    return removed
+
+
+def is_partitioned() -> bool:
+    if dialect_name() != "postgresql":
+        return False
+    return bool(
+        db.session.execute(
+            text(
+                "SELECT 1 FROM pg_partitioned_table p "
+                "JOIN pg_class c ON c.oid = p.partrelid "
+                "WHERE c.relname = 'currency_rates'"
+            )
+        ).scalar()
+    )
+
+
+def partition_table(months_ahead: int) -> None:
+    """Convert ``currency_rates`` into a table range-partitioned by month.
+
+    One-off PostgreSQL migration that runs in a single transaction: the
+    existing table is renamed, its rows copied into monthly partitions and
+    the old table dropped. Writes block while it runs.
+    """
+    if dialect_name() != "postgresql":
+        raise RuntimeError("Partitioning is only supported on PostgreSQL.")
+    if is_partitioned():
+        return
+
+    oldest = db.session.query(func.min(CurrencyRate.fetched_at)).scalar() or datetime.utcnow()
+    statements = [
+        "ALTER TABLE currency_rates RENAME TO currency_rates_legacy",
+        "ALTER TABLE currency_rates_legacy RENAME CONSTRAINT currency_rates_pkey "
+        "TO currency_rates_legacy_pkey",
+        "ALTER SEQUENCE currency_rates_id_seq OWNED BY NONE",
+        """
+        CREATE TABLE currency_rates (
+            id INTEGER NOT NULL DEFAULT nextval('currency_rates_id_seq'),
+            base_currency VARCHAR(3) NOT NULL,
+            quote_currency VARCHAR(3) NOT NULL,
+            rate DOUBLE PRECISION NOT NULL,
+            fetched_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            PRIMARY KEY (id, fetched_at)
+        ) PARTITION BY RANGE (fetched_at)
+        """,
+    ]
+    for statement in statements:
+        db.session.execute(text(statement))
+    _create_partitions(_month_start(oldest), months_ahead)
+    db.session.execute(
+        text(
+            "INSERT INTO currency_rates (id, base_currency, quote_currency, rate, fetched_at) "
+            "SELECT id, base_currency, quote_currency, rate, COALESCE(fetched_at, now()) "
+            "FROM currency_rates_legacy"
+        )
+    )
+    db.session.execute(text("DROP TABLE currency_rates_legacy"))
+    db.session.execute(text("ALTER SEQUENCE currency_rates_id_seq OWNED BY currency_rates.id"))
+    for index in CurrencyRate.__table__.indexes:
+        index.create(db.session.connection())
+    db.session.commit()
+
+
+def ensure_partitions(months_ahead: int) -> None:
+    """Create monthly partitions from the current month ``months_ahead`` out."""
+    if not is_partitioned():
+        return
+    _create_partitions(_month_start(datetime.utcnow()), months_ahead)
+    db.session.commit()
+
+
+def drop_partitions_before(cutoff: datetime) -> list[str]:
+    """Drop monthly partitions that end at or before ``cutoff``; return their names."""
+    names = db.session.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = 'currency_rates'"
+        )
+    ).scalars()
+    dropped: list[str] = []
+    for name in sorted(names):
+        if not name.startswith(PARTITION_PREFIX):
+            continue
+        month = datetime.strptime(name[len(PARTITION_PREFIX):], "%Y%m")
+        if _add_months(month, 1) > cutoff:
+            continue
+        db.session.execute(text(f'DROP TABLE "{name}"'))
+        dropped.append(name)
+    db.session.commit()
+    return dropped
+
+
+def _create_partitions(first_month: datetime, months_ahead: int) -> None:
+    month = first_month
+    last = _add_months(_month_start(datetime.utcnow()), months_ahead)
+    while month <= last:
+        upper = _add_months(month, 1)
+        db.session.execute(
+            text(
+                f'CREATE TABLE IF NOT EXISTS "{PARTITION_PREFIX}{month:%Y%m}" '
+                "PARTITION OF currency_rates "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+            )
+        )
+        month = upper
+
+
+def _month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def _add_months(value: datetime, months: int) -> datetime:
+    index = value.year * 12 + value.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from typing import Iterable
+
+import numpy as np
+
+from .rate_provider import RateProvider, Snapshot
+
+
+def build_matrix(
+    provider: RateProvider, currencies: Iterable[str]
+) -> tuple[list[str], np.ndarray, Snapshot]:
+    """Return the cross-rate matrix for ``currencies`` from one pivot vector.
+
+    ``matrix[i, j]`` is the rate for ``currencies[i]:currencies[j]``; codes the
+    pivot snapshot does not quote are left out of the result.
+    """
+    requested = list(dict.fromkeys(code.upper() for code in currencies))
+    snapshot = provider.get_pivot_snapshot(requested)
+    quoted = [code for code in requested if code in snapshot.rates]
+    vector = np.fromiter((snapshot.rates[code] for code in quoted), dtype=np.float64, count=len(quoted))
+    # base:quote = (pivot->quote) / (pivot->base), as one outer division.
+    matrix = vector[np.newaxis, :] / vector[:, np.newaxis]
+    return quoted, matrix, snapshot
@@ -1,90 +1,663 @@
 from __future__ import annotations
 
 import json
+import secrets
+import threading
+import time
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from functools import cached_property
 from datetime import datetime
 from typing import Iterable
 
 import requests
 from flask import current_app
+from sqlalchemy import func, select
 
-from ..extensions import db, redis_client
+from ..extensions import PerProcess, db, get_redis
 from ..models import CurrencyRate
+from .circuit_breaker import CircuitOpen, upstream_breaker
+from .http_client import upstream_get, worst_case_call_seconds
+from .local_cache import snapshot_cache
+from .pubsub import pubsub_listener
+from .quota import QuotaExhausted, quota_budget
+from .single_flight import SingleFlight
+from .snapshot_writer import snapshot_writer
+
+CACHE_PREFIX = "rates:"
+# Hash field holding the snapshot timestamp. Quote fields are ISO currency
+# codes, so the leading underscore can never collide with one.
+FETCHED_AT_FIELD = "_fetched_at"
+# Sorted set of snapshot base -> last time a request asked for it.
+DEMAND_KEY = "demand:rates"
+# Every freshly written snapshot is published here for live subscribers.
+UPDATES_CHANNEL = "rates:updates"
+FETCH_LOCK_PREFIX = "lock:rates:"
+FETCH_LOCK_POLL_SECONDS = 0.05
+CIRCUIT_OPEN_ERROR = "Rate source circuit open"
+QUOTA_EXHAUSTED_ERROR = "Upstream quota exhausted"
+BASE_REJECTED_ERROR = "Rate source does not quote this base"
+# Upstream statuses that say the requested base itself is invalid.
+BASE_REJECTED_STATUSES = frozenset({400, 404, 422})
+
+# Only delete the lock if this worker still owns it (the lease may have
+# expired and been taken over by another worker).
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+@dataclass
+class Snapshot:
+    """Quote vector for one base along with when it was fetched upstream."""
+
+    rates: dict[str, float]
+    fetched_at: datetime
+
+    @property
+    def age_seconds(self) -> float:
+        return (datetime.utcnow() - self.fetched_at).total_seconds()
+
+    @cached_property
+    def fetched_at_iso(self) -> str:
+        return self.fetched_at.isoformat()
+
+
+# Per-process coalescing of upstream fetches, keyed by base currency.
+_inflight: SingleFlight[Snapshot] = SingleFlight()
+# Bases with a background revalidation running in this process.
+_revalidating: set[str] = set()
+_revalidating_lock = threading.Lock()
+# Bounded pool for concurrent multi-base fetches.
+_fetch_pool: PerProcess[ThreadPoolExecutor] = PerProcess(
+    lambda: ThreadPoolExecutor(
+        max_workers=current_app.config["RATE_FETCH_MAX_WORKERS"],
+        thread_name_prefix="rate-fetch",
+    )
+)
+
+
+# When this process last recorded demand for each code (monotonic seconds).
+_demand_recorded: dict[str, float] = {}
+_demand_recorded_lock = threading.Lock()
+
+
+def _unrecorded_demand(codes: Iterable[str]) -> list[str]:
+    """Return the codes whose demand this process has not recorded lately.
+
+    Nothing needs demand while triangulating, since only the pivot is kept
+    warm, and otherwise a code is recorded at most once every
+    ``RATE_DEMAND_RECORD_SECONDS``, so L1 hits need no Redis round trip.
+    """
+    if current_app.config["RATE_TRIANGULATION"]:
+        return []
+    interval = current_app.config["RATE_DEMAND_RECORD_SECONDS"]
+    now = time.monotonic()
+    due: list[str] = []
+    with _demand_recorded_lock:
+        for code in codes:
+            recorded = _demand_recorded.get(code)
+            if recorded is None or now - recorded >= interval:
+                _demand_recorded[code] = now
+                due.append(code)
+    return due
+
+
+_cache_subscribed = False
+_cache_subscribe_lock = threading.Lock()
+
+
+def _subscribe_snapshot_cache() -> None:
+    """Keep this process's L1 cache in step with snapshots written by any worker."""
+    global _cache_subscribed
+    if _cache_subscribed:
+        return
+    with _cache_subscribe_lock:
+        if _cache_subscribed:
+            return
+        _cache_subscribed = True
+    pubsub_listener.subscribe(UPDATES_CHANNEL, _apply_published_snapshot)
+
+
+def _apply_published_snapshot(data: str) -> None:
+    payload = json.loads(data)
+    snapshot_cache.put(
+        payload["base"],
+        Snapshot(payload["rates"], datetime.fromisoformat(payload["fetched_at"])),
+    )
 
 
 class RateProvider:
-    """Fetches rates from the upstream API with Redis caching."""
+    """Fetches rates from the upstream API with Redis caching.
+
+    Each base has one canonical cache entry, a hash ``rates:{base}`` holding
+    the full quote vector, so any subset of symbols is served with one HMGET.
+    Requested pairs are derived from the snapshot of the ``RATE_PIVOT``
+    currency, so a request costs at most one upstream call; with
+    ``RATE_TRIANGULATION`` off, each base's snapshot is fetched concurrently.
+
+    Snapshots are fresh for ``ttl_seconds`` and kept in Redis until
+    ``RATE_CACHE_HARD_TTL``; in between they are served flagged as stale
+    while a background refresh replaces them. The soft TTL stretches when
+    the upstream quota runs low (see :class:`QuotaBudget`). Fresh snapshots are also held
+    in a per-process LRU that every write, local or published by another
+    worker, replaces.
+    """
 
     def __init__(self, ttl_seconds: int) -> None:
         self.ttl_seconds = ttl_seconds
+        self.hard_ttl_seconds = max(current_app.config["RATE_CACHE_HARD_TTL"], ttl_seconds)
 
     def get_rates(self, pairs: Iterable[tuple[str, str]]) -> list[dict]:
-        grouped: dict[str, list[str]] = defaultdict(list)
-        for base, quote in pairs:
-            grouped[base.upper()].append(quote.upper())
-
+        normalized, snapshots, errors = self._resolve_pairs(pairs)
         aggregated: list[dict] = []
-        for base, symbols in grouped.items():
-            api_rates = self._fetch_rates_for_base(base, symbols)
-            for quote, rate in api_rates.items():
+        for base, quote in normalized:
+            snapshot_base = self.snapshot_base_for(base)
+            if snapshot_base in errors:
                 aggregated.append(
                     {
                         "pair": f"{base}:{quote}",
                         "base": base,
                         "quote": quote,
-                        "rate": rate,
-                        "fetched_at": datetime.utcnow().isoformat(),
+                        "error": errors[snapshot_base],
                     }
                 )
+                continue
+            quoted = self.quote_pair(base, quote, snapshot_base, snapshots[snapshot_base])
+            if quoted is not None:
+                aggregated.append(quoted)
         return aggregated
 
-    def _fetch_rates_for_base(self, base: str, symbols: list[str]) -> dict[str, float]:
-        cache_key = self._build_cache_key(base, symbols)
-        cached = self._read_cache(cache_key)
-        if cached:
-            return cached
+    def get_rates_columnar(self, pairs: Iterable[tuple[str, str]]) -> dict[str, list | dict]:
+        """Same rates as :meth:`get_rates`, as parallel arrays instead of per-pair dicts.
+
+        Timestamp, age and staleness are computed once per snapshot. Pairs
+        whose snapshot failed carry ``None`` and a message under ``errors``.
+        """
+        normalized, snapshots, errors = self._resolve_pairs(pairs)
+        freshness = {
+            base: (snapshot.fetched_at_iso, round(snapshot.age_seconds, 3))
+            for base, snapshot in snapshots.items()
+        }
+        columns: dict[str, list] = {
+            "pairs": [],
+            "rates": [],
+            "sources": [],
+            "fetched_at": [],
+            "stale": [],
+            "age_seconds": [],
+        }
+        failed: dict[str, str] = {}
+        for base, quote in normalized:
+            pair = f"{base}:{quote}"
+            snapshot_base = self.snapshot_base_for(base)
+            if snapshot_base in errors:
+                failed[pair] = errors[snapshot_base]
+                rate = source = fetched_at = stale = age = None
+            else:
+                rate = self._pair_rate(base, quote, snapshot_base, snapshots[snapshot_base])
+                if rate is None:
+                    continue
+                source = "direct" if base == snapshot_base or base == quote else "derived"
+                fetched_at, age = freshness[snapshot_base]
+                stale = age > self.ttl_seconds
+            columns["pairs"].append(pair)
+            columns["rates"].append(rate)
+            columns["sources"].append(source)
+            columns["fetched_at"].append(fetched_at)
+            columns["stale"].append(stale)
+            columns["age_seconds"].append(age)
+        if failed:
+            return {**columns, "errors": failed}
+        return columns
+
+    def _resolve_pairs(
+        self, pairs: Iterable[tuple[str, str]]
+    ) -> tuple[list[tuple[str, str]], dict[str, Snapshot], dict[str, str]]:
+        # With triangulation every pair comes from the pivot snapshot: the
+        # pivot P quotes P->X for all X, so base:quote is (P->quote) / (P->base).
+        # Without it each base is served from its own snapshot.
+        pivot = current_app.config["RATE_PIVOT"]
+        triangulate = current_app.config["RATE_TRIANGULATION"]
+        normalized = list(dict.fromkeys((base.upper(), quote.upper()) for base, quote in pairs))
+        bases = sorted({base for base, _ in normalized})
+
+        symbols_by_base: dict[str, list[str]] = defaultdict(list)
+        for base, quote in normalized:
+            if triangulate:
+                symbols_by_base[pivot].extend(code for code in (base, quote) if code != pivot)
+            else:
+                symbols_by_base[base].append(quote)
+        snapshots, errors = self._fetch_snapshots(symbols_by_base, demanded=bases)
+        return normalized, snapshots, errors
+
+    def snapshot_base_for(self, base: str) -> str:
+        """Return the base of the snapshot that pairs on ``base`` are read from."""
+        if current_app.config["RATE_TRIANGULATION"]:
+            return current_app.config["RATE_PIVOT"]
+        return base
+
+    def quote_pair(
+        self, base: str, quote: str, snapshot_base: str, snapshot: Snapshot
+    ) -> dict | None:
+        """Build the rate entry for ``base:quote`` from ``snapshot_base``'s snapshot."""
+        rate = self._pair_rate(base, quote, snapshot_base, snapshot)
+        if rate is None:
+            return None
+        age = round(snapshot.age_seconds, 3)
+        return {
+            "pair": f"{base}:{quote}",
+            "base": base,
+            "quote": quote,
+            "rate": rate,
+            "source": "direct" if base == snapshot_base or base == quote else "derived",
+            "fetched_at": snapshot.fetched_at_iso,
+            "stale": age > self.ttl_seconds,
+            "age_seconds": age,
+        }
+
+    @staticmethod
+    def _pair_rate(base: str, quote: str, snapshot_base: str, snapshot: Snapshot) -> float | None:
+        rates = snapshot.rates
+        base_rate = 1.0 if base == snapshot_base else rates.get(base)
+        quote_rate = 1.0 if quote == snapshot_base else rates.get(quote)
+        if base_rate is None or quote_rate is None:
+            return None
+        return quote_rate / base_rate
+
+    def get_pivot_snapshot(self, currencies: Iterable[str]) -> Snapshot:
+        """Return the pivot snapshot restricted to ``currencies``.
+
+        The pivot itself is included with a rate of 1.0, so callers can
+        derive any cross rate from the result without special cases.
+        """
+        pivot = current_app.config["RATE_PIVOT"]
+        symbols = sorted({code.upper() for code in currencies} - {pivot})
+        snapshots, _ = self._fetch_snapshots({pivot: symbols}, demanded=[pivot])
+        snapshot = snapshots[pivot]
+        return Snapshot({**snapshot.rates, pivot: 1.0}, snapshot.fetched_at)
+
+    def fresh_seconds(self) -> float:
+        """Age up to which snapshots are served without revalidation.
+
+        Normally ``ttl_seconds``; stretched by the quota budget when refreshing
+        every demanded base that often would overspend the upstream plan.
+        """
+        return quota_budget.effective_ttl(
+            self.ttl_seconds, self.hard_ttl_seconds, self._count_active_bases
+        )
+
+    def budget_state(self) -> dict:
+        return quota_budget.state(self.ttl_seconds, self.hard_ttl_seconds, self._count_active_bases)
+
+    def _count_active_bases(self) -> int:
+        if current_app.config["RATE_TRIANGULATION"]:
+            return 1
+        since = time.time() - current_app.config["RATE_DEMAND_WINDOW_SECONDS"]
+        return get_redis().zcount(DEMAND_KEY, since, "+inf")
+
+    def snapshot_bases(self, bases: Iterable[str]) -> set[str]:
+        """Return the snapshot bases needed to quote pairs on ``bases``."""
+        if current_app.config["RATE_TRIANGULATION"]:
+            return {current_app.config["RATE_PIVOT"]}
+        return set(bases)
+
+    def refresh_bases(self, bases: Iterable[str]) -> dict[str, str]:
+        """Refresh several snapshots concurrently; return errors by base."""
+        _, errors = self._refresh_concurrently(list(bases), deadline=None)
+        return errors
+
+    def snapshot_age(self, base: str) -> float | None:
+        """Seconds since the cached snapshot for ``base`` was fetched, if any."""
+        return self.snapshot_ages([base])[base]
+
+    def snapshot_ages(self, bases: Iterable[str]) -> dict[str, float | None]:
+        """Like :meth:`snapshot_age` for several bases, in one Redis round trip."""
+        bases = list(bases)
+        redis_client = get_redis()
+        if not redis_client or not bases:
+            return dict.fromkeys(bases)
+        pipe = redis_client.pipeline(transaction=False)
+        for base in bases:
+            pipe.hget(self._build_cache_key(base), FETCHED_AT_FIELD)
+        now = datetime.utcnow()
+        return {
+            base: (now - datetime.fromisoformat(fetched_at)).total_seconds() if fetched_at else None
+            for base, fetched_at in zip(bases, pipe.execute())
+        }
 
+    def refresh_base(self, base: str) -> Snapshot:
+        """Fetch the full quote vector for ``base`` and store it as the snapshot.
+
+        Concurrent refreshes of the same base are coalesced: threads in this
+        process share one in-flight call, and across workers a short Redis
+        lease lets one fetch while the others wait for its snapshot.
+        """
+        return _inflight.do(base, lambda: self._refresh_coalesced(base))
+
+    def _refresh_coalesced(self, base: str) -> Snapshot:
+        lock_token = self._acquire_fetch_lock(base)
+        if lock_token is None:
+            snapshot = self._wait_for_snapshot(base)
+            if snapshot is not None:
+                return snapshot
+            # The leader failed or outlived its lease; fetch ourselves.
+        try:
+            return self._fetch_upstream(base)
+        finally:
+            if lock_token is not None:
+                self._release_fetch_lock(base, lock_token)
+
+    def _fetch_upstream(self, base: str) -> Snapshot:
         params = {
             "base_currency": base,
-            "currencies": ",".join(symbols),
             "apikey": current_app.config["FREECURRENCY_API_KEY"],
         }
-        response = requests.get(
-            current_app.config["FREECURRENCY_API_URL"], params=params, timeout=15
-        )
+        # Spend quota before leasing the half-open probe, so a refusal from
+        # the budget cannot leave the probe leased with nobody calling.
+        upstream_breaker.check()
+        if not quota_budget.try_acquire():
+            raise QuotaExhausted(quota_budget.retry_after())
+        probe = upstream_breaker.before_call()
+        started = time.monotonic()
+        try:
+            response = upstream_get(current_app.config["FREECURRENCY_API_URL"], params)
+        except requests.RequestException:
+            upstream_breaker.record(time.monotonic() - started, ok=False)
+            raise
+        except BaseException:
+            upstream_breaker.release_probe(probe)
+            raise
+        # Client errors (bad key, unknown base) say nothing about upstream health.
+        healthy = response.status_code < 500 and response.status_code != 429
+        upstream_breaker.record(time.monotonic() - started, ok=healthy)
         response.raise_for_status()
         data = response.json()
         payload = data.get("data", {})
         rates: dict[str, float] = {quote.upper(): float(value) for quote, value in payload.items()}
 
+        snapshot = Snapshot(rates, datetime.utcnow())
         if rates:
-            self._write_cache(cache_key, rates)
-            self._persist_rates(base, rates)
+            self._write_cache(self._build_cache_key(base), snapshot)
+            if self._use_local_cache():
+                snapshot_cache.put(base, snapshot)
+            snapshot_writer.enqueue(base, rates, snapshot.fetched_at)
+
+        return snapshot
 
-        return rates
+    def _acquire_fetch_lock(self, base: str) -> str | None:
+        """Return a lock token if this worker should fetch, ``None`` to wait."""
+        redis_client = get_redis()
+        token = secrets.token_hex(8)
+        if not redis_client:
+            return token
+        lease_ms = int(self._fetch_lock_seconds() * 1000)
+        if redis_client.set(f"{FETCH_LOCK_PREFIX}{base}", token, nx=True, px=lease_ms):
+            return token
+        return None
 
     @staticmethod
-    def _build_cache_key(base: str, symbols: list[str]) -> str:
-        joined = ",".join(sorted(symbols))
-        return f"rates:{base}:{joined}"
+    def _fetch_lock_seconds() -> float:
+        # The lease must outlive the slowest upstream call, or waiters give up
+        # on a leader that is still fetching and all call upstream themselves.
+        config = current_app.config
+        return max(config["RATE_FETCH_LOCK_SECONDS"], worst_case_call_seconds(config) + 1)
 
-    def _read_cache(self, key: str) -> dict[str, float] | None:
-        if not redis_client:
+    def _release_fetch_lock(self, base: str, token: str) -> None:
+        redis_client = get_redis()
+        if redis_client:
+            redis_client.eval(_RELEASE_LOCK_SCRIPT, 1, f"{FETCH_LOCK_PREFIX}{base}", token)
+
+    def _wait_for_snapshot(self, base: str) -> Snapshot | None:
+        """Wait for the lock holder to finish, then read its snapshot.
+
+        Returns ``None`` unless the leader wrote a snapshot while we waited;
+        an older one is what prompted the refresh, so serving it would hide
+        the leader's failure.
+        """
+        redis_client = get_redis()
+        lock_key = f"{FETCH_LOCK_PREFIX}{base}"
+        waited_from = datetime.utcnow()
+        deadline = time.monotonic() + self._fetch_lock_seconds()
+        while time.monotonic() < deadline and redis_client.exists(lock_key):
+            time.sleep(FETCH_LOCK_POLL_SECONDS)
+        if redis_client.exists(lock_key):
             return None
-        payload = redis_client.get(key)
-        if not payload:
+        snapshot = self._read_snapshot(self._build_cache_key(base))
+        if snapshot is None or snapshot.fetched_at < waited_from:
             return None
-        return json.loads(payload)
+        return snapshot
 
-    def _write_cache(self, key: str, payload: dict[str, float]) -> None:
-        if not redis_client:
-            return
-        redis_client.setex(key, self.ttl_seconds, json.dumps(payload))
+    def _fetch_snapshots(
+        self, symbols_by_base: dict[str, list[str]], demanded: list[str] = ()
+    ) -> tuple[dict[str, Snapshot], dict[str, str]]:
+        """Resolve snapshots for every base, fetching the misses concurrently.
+
+        When the request spans a single base, a miss is fetched inline so its
+        error propagates; otherwise failures and deadline overruns are
+        reported per base and the other bases are still served.
+        While the upstream circuit is open or the quota is spent, misses fall
+        back to the last snapshot persisted in the database when
+        ``BREAKER_SERVE_PERSISTED``.
+        """
+        snapshots = self._cached_snapshots(symbols_by_base)
+        misses = [base for base in symbols_by_base if base not in snapshots]
 
-    def _persist_rates(self, base: str, rates: dict[str, float]) -> None:
-        for quote, rate in rates.items():
-            db.session.add(
-                CurrencyRate(base_currency=base, quote_currency=quote, rate=rate)
+        errors: dict[str, str] = {}
+        if len(symbols_by_base) == 1 and misses:
+            try:
+                snapshots[misses[0]] = self.refresh_base(misses[0])
+            except (CircuitOpen, QuotaExhausted):
+                fallback = self._persisted_snapshot(misses[0])
+                if fallback is None:
+                    raise
+                snapshots[misses[0]] = fallback
+        elif misses:
+            fetched, errors = self._refresh_concurrently(
+                misses, deadline=current_app.config["RATE_REQUEST_DEADLINE_SECONDS"]
             )
-        db.session.commit()
+            snapshots.update(fetched)
+            unavailable = (CIRCUIT_OPEN_ERROR, QUOTA_EXHAUSTED_ERROR)
+            for base in [base for base, error in errors.items() if error in unavailable]:
+                fallback = self._persisted_snapshot(base)
+                if fallback is not None:
+                    snapshots[base] = fallback
+                    del errors[base]
+        # Only bases that yielded rates count as demand, so requests for
+        # codes upstream does not know cannot make the refresher poll them.
+        self._record_demand(
+            [base for base in demanded if base in snapshots and snapshots[base].rates]
+        )
+        return snapshots, errors
+
+    def _record_demand(self, bases: list[str]) -> None:
+        redis_client = get_redis()
+        bases = _unrecorded_demand(bases)
+        if redis_client and bases:
+            redis_client.zadd(DEMAND_KEY, {base: time.time() for base in bases})
+
+    def _persisted_snapshot(self, base: str) -> Snapshot | None:
+        """Rebuild the newest snapshot for ``base`` from ``currency_rates``."""
+        if not current_app.config["BREAKER_SERVE_PERSISTED"]:
+            return None
+        latest = db.session.scalar(
+            select(func.max(CurrencyRate.fetched_at)).where(CurrencyRate.base_currency == base)
+        )
+        if latest is None:
+            return None
+        rows = db.session.execute(
+            select(CurrencyRate.quote_currency, CurrencyRate.rate).where(
+                CurrencyRate.base_currency == base, CurrencyRate.fetched_at == latest
+            )
+        )
+        return Snapshot({quote: rate for quote, rate in rows}, latest)
+
+    def _refresh_concurrently(
+        self, bases: list[str], deadline: float | None
+    ) -> tuple[dict[str, Snapshot], dict[str, str]]:
+        app = current_app._get_current_object()
+
+        def refresh(base: str) -> Snapshot:
+            with app.app_context():
+                return self.refresh_base(base)
+
+        futures = {_fetch_pool.get().submit(refresh, base): base for base in bases}
+        done, pending = wait(futures, timeout=deadline)
+
+        snapshots: dict[str, Snapshot] = {}
+        errors: dict[str, str] = {}
+        for future in done:
+            base = futures[future]
+            try:
+                snapshots[base] = future.result()
+            except QuotaExhausted:
+                errors[base] = QUOTA_EXHAUSTED_ERROR
+            except CircuitOpen:
+                errors[base] = CIRCUIT_OPEN_ERROR
+            except requests.HTTPError as exc:
+                if exc.response is not None and exc.response.status_code in BASE_REJECTED_STATUSES:
+                    errors[base] = BASE_REJECTED_ERROR
+                else:
+                    app.logger.warning("Fetching %s rates failed: %s", base, exc)
+                    errors[base] = "Rate source unavailable"
+            except Exception as exc:
+                app.logger.warning("Fetching %s rates failed: %s", base, exc)
+                errors[base] = "Rate source unavailable"
+        # Overrunning fetches keep running and still populate the cache.
+        for future in pending:
+            errors[futures[future]] = "Rate source timed out"
+        return snapshots, errors
 
+    def _cached_snapshots(self, symbols_by_base: dict[str, list[str]]) -> dict[str, Snapshot]:
+        """Return the cached snapshot of every base that has one.
+
+        Bases missing from the L1 cache are read in a single Redis pipeline
+        rather than a round trip each. Stale snapshots are returned and
+        revalidated in the background.
+        """
+        use_local = self._use_local_cache()
+        fresh_seconds = self.fresh_seconds()
+        snapshots: dict[str, Snapshot] = {}
+        remote: list[str] = []
+        for base in symbols_by_base:
+            cached = snapshot_cache.get(base, fresh_seconds) if use_local else None
+            if cached is None:
+                remote.append(base)
+            else:
+                snapshots[base] = cached
+
+        redis_client = get_redis()
+        if not redis_client or not remote:
+            return snapshots
+        pipe = redis_client.pipeline(transaction=False)
+        for base in remote:
+            key = self._build_cache_key(base)
+            if use_local:
+                # Read the whole vector so the L1 entry can serve any symbols.
+                pipe.hgetall(key)
+            else:
+                pipe.hmget(key, [*dict.fromkeys(symbols_by_base[base]), FETCHED_AT_FIELD])
+        results = pipe.execute()
+
+        for base, result in zip(remote, results):
+            if use_local:
+                cached = self._parse_snapshot(result)
+            else:
+                cached = self._parse_symbols(list(dict.fromkeys(symbols_by_base[base])), result)
+            if cached is None:
+                continue
+            if cached.age_seconds > fresh_seconds:
+                self._revalidate_in_background(base)
+            elif use_local:
+                snapshot_cache.put(base, cached)
+            snapshots[base] = cached
+        return snapshots
+
+    def _revalidate_in_background(self, base: str) -> None:
+        with _revalidating_lock:
+            if base in _revalidating:
+                return
+            _revalidating.add(base)
+
+        app = current_app._get_current_object()
+
+        def revalidate() -> None:
+            try:
+                with app.app_context():
+                    RateProvider(self.ttl_seconds).refresh_base(base)
+            except (QuotaExhausted, CircuitOpen) as exc:
+                app.logger.warning("Serving stale %s rates: %s", base, exc)
+            except Exception:
+                app.logger.exception("Background refresh of %s rates failed", base)
+            finally:
+                with _revalidating_lock:
+                    _revalidating.discard(base)
+
+        threading.Thread(target=revalidate, name=f"revalidate-{base}", daemon=True).start()
+
+    def _use_local_cache(self) -> bool:
+        # Without Redis there is nothing to stay consistent with across workers.
+        if not snapshot_cache.enabled or self.ttl_seconds <= 0 or not get_redis():
+            return False
+        _subscribe_snapshot_cache()
+        return True
+
+    @staticmethod
+    def _build_cache_key(base: str) -> str:
+        return f"{CACHE_PREFIX}{base}"
+
+    def _read_snapshot(self, key: str) -> Snapshot | None:
+        redis_client = get_redis()
+        if not redis_client:
+            return None
+        return self._parse_snapshot(redis_client.hgetall(key))
+
+    @staticmethod
+    def _parse_snapshot(payload: dict[str, str]) -> Snapshot | None:
+        fetched_at = payload.pop(FETCHED_AT_FIELD, None)
+        if fetched_at is None:
+            return None
+        rates = {quote: float(value) for quote, value in payload.items()}
+        return Snapshot(rates, datetime.fromisoformat(fetched_at))
+
+    @staticmethod
+    def _parse_symbols(symbols: list[str], values: list[str | None]) -> Snapshot | None:
+        # ``values`` is an HMGET of ``symbols`` followed by the timestamp. A
+        # present snapshot holds the full quote vector, so a symbol missing
+        # from it is one upstream does not quote rather than a cache miss.
+        if values[-1] is None:
+            return None
+        rates = {
+            symbol: float(value)
+            for symbol, value in zip(symbols, values[:-1])
+            if value is not None
+        }
+        return Snapshot(rates, datetime.fromisoformat(values[-1]))
+
+    def _write_cache(self, key: str, snapshot: Snapshot) -> None:
+        redis_client = get_redis()
+        if not redis_client or self.ttl_seconds <= 0:
+            return
+        mapping: dict[str, str] = {quote: repr(rate) for quote, rate in snapshot.rates.items()}
+        mapping[FETCHED_AT_FIELD] = snapshot.fetched_at.isoformat()
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.delete(key)
+        pipe.hset(key, mapping=mapping)
+        # The soft TTL is judged from the timestamp; Redis only enforces the
+        # hard TTL after which stale data may no longer be served.
+        pipe.expire(key, self.hard_ttl_seconds)
+        pipe.publish(
+            UPDATES_CHANNEL,
+            json.dumps(
+                {
+                    "base": key[len(CACHE_PREFIX):],
+                    "fetched_at": mapping[FETCHED_AT_FIELD],
+                    "rates": snapshot.rates,
+                }
+            ),
+        )
+        pipe.execute()
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import time
+
+from flask import current_app
+
+from ..extensions import db, get_redis
+from ..models import TrackedPair, UserFavorite
+from .quota import quota_budget
+from .rate_provider import BASE_REJECTED_ERROR, DEMAND_KEY, RateProvider
+
+
+class RateRefresher:
+    """Keeps in-demand rate snapshots warm ahead of their soft expiry."""
+
+    def __init__(
+        self,
+        provider: RateProvider,
+        lead_seconds: int,
+        interval_seconds: float,
+        demand_window_seconds: int,
+        stored_pairs_seconds: float = 60,
+    ) -> None:
+        self.provider = provider
+        self.lead_seconds = lead_seconds
+        self.interval_seconds = interval_seconds
+        self.demand_window_seconds = demand_window_seconds
+        self.stored_pairs_seconds = stored_pairs_seconds
+        self._stored: set[str] = set()
+        self._stored_read_at: float | None = None
+        # Bases upstream rejected -> monotonic time until which they are skipped.
+        self._rejected: dict[str, float] = {}
+
+    @classmethod
+    def from_config(cls) -> "RateRefresher":
+        config = current_app.config
+        return cls(
+            RateProvider(config["RATE_CACHE_TTL"]),
+            lead_seconds=config["RATE_REFRESH_LEAD_SECONDS"],
+            interval_seconds=config["RATE_REFRESH_INTERVAL_SECONDS"],
+            demand_window_seconds=config["RATE_DEMAND_WINDOW_SECONDS"],
+            stored_pairs_seconds=config["RATE_REFRESH_STORED_PAIRS_SECONDS"],
+        )
+
+    def demanded_bases(self) -> set[str]:
+        """Snapshot bases to keep warm."""
+        if current_app.config["RATE_TRIANGULATION"]:
+            # Every pair is quoted from the pivot, whatever is demanded.
+            return {current_app.config["RATE_PIVOT"]}
+        return self.provider.snapshot_bases(self.requested_bases())
+
+    def requested_bases(self) -> set[str]:
+        """Bases of the default pairs, stored pairs and recent requests.
+
+        Quote currencies are never bases of their own snapshot here; each
+        pair is read from its base's snapshot.
+        """
+        bases: set[str] = {current_app.config["DEFAULT_BASE"]}
+        bases.update(self.stored_bases())
+
+        redis_client = get_redis()
+        if redis_client:
+            since = time.time() - self.demand_window_seconds
+            bases.update(redis_client.zrangebyscore(DEMAND_KEY, since, "+inf"))
+            # Drop entries that fell out of the window so the set stays small.
+            redis_client.zremrangebyscore(DEMAND_KEY, "-inf", f"({since}")
+        return bases
+
+    def stored_bases(self) -> set[str]:
+        """Base currencies in the watchlist or any favorites.
+
+        Re-read at most every ``stored_pairs_seconds`` rather than scanning
+        both tables on every tick.
+        """
+        now = time.monotonic()
+        if self._stored_read_at is None or now - self._stored_read_at >= self.stored_pairs_seconds:
+            stored: set[str] = set()
+            for model in (TrackedPair, UserFavorite):
+                rows = db.session.query(model.base_currency).distinct()
+                stored.update(base for (base,) in rows)
+            self._stored, self._stored_read_at = stored, now
+        return self._stored
+
+    def run_once(self) -> list[str]:
+        """Refresh every demanded snapshot that is close to expiry.
+
+        When the upstream quota cannot cover them all, the most recently
+        requested bases go first and the rest wait for the next tick.
+        """
+        ages = self.provider.snapshot_ages(sorted(self.demanded_bases() - self.rejected_bases()))
+        fresh_seconds = self.provider.fresh_seconds()
+        due = self.prioritise(
+            [
+                base
+                for base, age in ages.items()
+                if age is None or age >= fresh_seconds - self.lead_seconds
+            ]
+        )
+        headroom = quota_budget.headroom()
+        if headroom is not None:
+            due = due[:headroom]
+        errors = self.provider.refresh_bases(due) if due else {}
+        for base, error in errors.items():
+            if error == BASE_REJECTED_ERROR:
+                self.reject(base)
+            else:
+                current_app.logger.error("Failed to refresh rates for %s", base)
+        refreshed = [base for base in due if base not in errors]
+        # Release the connection between ticks rather than holding it idle.
+        db.session.remove()
+        return refreshed
+
+    def rejected_bases(self) -> set[str]:
+        now = time.monotonic()
+        self._rejected = {base: until for base, until in self._rejected.items() if until > now}
+        return set(self._rejected)
+
+    def reject(self, base: str) -> None:
+        """Stop refreshing ``base`` for a demand window after upstream refused it."""
+        current_app.logger.warning("Rate source rejected base %s; not refreshing it", base)
+        self._rejected[base] = time.monotonic() + self.demand_window_seconds
+        redis_client = get_redis()
+        if redis_client:
+            redis_client.zrem(DEMAND_KEY, base)
+
+    def prioritise(self, bases: list[str]) -> list[str]:
+        """Order ``bases`` by when they were last requested, newest first."""
+        redis_client = get_redis()
+        if not redis_client or len(bases) < 2:
+            return bases
+        scores = redis_client.zmscore(DEMAND_KEY, bases)
+        ranked = sorted(zip(bases, scores), key=lambda item: item[1] or 0.0, reverse=True)
+        return [base for base, _ in ranked]
+
+    def run_forever(self) -> None:
+        current_app.logger.info(
+            "Rate refresher started (lead=%ss, interval=%ss)",
+            self.lead_seconds,
+            self.interval_seconds,
+        )
+        while True:
+            started = time.monotonic()
+            try:
+                refreshed = self.run_once()
+            except Exception:
+                current_app.logger.exception("Rate refresher tick failed")
+                db.session.rollback()
+            else:
+                if refreshed:
+                    current_app.logger.info("Refreshed rates for %s", ", ".join(refreshed))
+            elapsed = time.monotonic() - started
+            time.sleep(max(self.interval_seconds - elapsed, 0))
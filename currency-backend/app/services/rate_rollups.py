@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, func, select
+
+from ..extensions import db
+from ..models import CurrencyRate, CurrencyRateRollup
+from .sql_helpers import as_datetime, bucket_epoch, dialect_insert, greatest, least
+
+# Rollup resolutions, coarsest first so lookups pick the cheapest table rows.
+RESOLUTIONS: dict[str, int] = {"1d": 86400, "1h": 3600, "1m": 60}
+BACKFILL_CHUNK_SIZE = 1000
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def bucket_start(value: datetime, seconds: int) -> datetime:
+    offset = int((value - _EPOCH).total_seconds())
+    return _EPOCH + timedelta(seconds=offset - offset % seconds)
+
+
+def apply_rollups(rows: list[dict]) -> None:
+    """Fold freshly inserted raw rows into every rollup resolution.
+
+    Runs in the caller's transaction; the caller commits.
+    """
+    buckets: dict[tuple, dict] = {}
+    for row in sorted(rows, key=lambda item: item["fetched_at"]):
+        for resolution, seconds in RESOLUTIONS.items():
+            key = (
+                resolution,
+                row["base_currency"],
+                row["quote_currency"],
+                bucket_start(row["fetched_at"], seconds),
+            )
+            rate, fetched_at = row["rate"], row["fetched_at"]
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = {
+                    "resolution": key[0],
+                    "base_currency": key[1],
+                    "quote_currency": key[2],
+                    "bucket_start": key[3],
+                    "open": rate,
+                    "high": rate,
+                    "low": rate,
+                    "close": rate,
+                    "count": 1,
+                    "first_at": fetched_at,
+                    "last_at": fetched_at,
+                }
+            else:
+                bucket["high"] = max(bucket["high"], rate)
+                bucket["low"] = min(bucket["low"], rate)
+                bucket["close"] = rate
+                bucket["count"] += 1
+                bucket["last_at"] = fetched_at
+    if buckets:
+        _upsert(list(buckets.values()), merge=True)
+
+
+def backfill_rollups(start: datetime | None = None, end: datetime | None = None) -> int:
+    """Recompute rollups from raw history in ``[start, end)``; return rows written.
+
+    Buckets are replaced rather than merged, so the command can be rerun.
+    Bounds are widened to whole days so no bucket is rebuilt from part of
+    its raw rows. History is aggregated and committed one day at a time,
+    so memory stays bounded by a single day's buckets, and days without
+    raw rows are skipped.
+    """
+    day = RESOLUTIONS["1d"]
+    start = bucket_start(start, day) if start else None
+    end = bucket_start(end + timedelta(seconds=day - 1), day) if end else None
+
+    written = 0
+    day_start = _next_raw_day(start, end)
+    while day_start is not None:
+        day_end = day_start + timedelta(seconds=day)
+        for resolution, seconds in RESOLUTIONS.items():
+            rows = [
+                {
+                    "resolution": resolution,
+                    "base_currency": row.base_currency,
+                    "quote_currency": row.quote_currency,
+                    "bucket_start": _EPOCH + timedelta(seconds=row.bucket),
+                    "open": row.open,
+                    "high": row.high,
+                    "low": row.low,
+                    "close": row.close,
+                    "count": row.count,
+                    "first_at": as_datetime(row.first_at),
+                    "last_at": as_datetime(row.last_at),
+                }
+                for row in db.session.execute(_aggregate_raw(seconds, day_start, day_end))
+            ]
+            for offset in range(0, len(rows), BACKFILL_CHUNK_SIZE):
+                _upsert(rows[offset : offset + BACKFILL_CHUNK_SIZE], merge=False)
+            written += len(rows)
+        db.session.commit()
+        day_start = _next_raw_day(day_end, end)
+    return written
+
+
+def rollup_resolution(interval_seconds: int) -> str | None:
+    """The coarsest resolution ``interval_seconds`` is a whole multiple of, if any."""
+    return next(
+        (name for name, seconds in RESOLUTIONS.items() if interval_seconds % seconds == 0), None
+    )
+
+
+def rollup_covered_from(resolution: str, base: str, quote: str) -> datetime | None:
+    """Earliest observation folded into the pair's rollups at ``resolution``.
+
+    Raw rows before it (history persisted before rollups existed and not
+    yet backfilled) are missing from the rollups. ``None`` means the pair
+    has no rollups at all.
+    """
+    rollup = CurrencyRateRollup
+    first_at = db.session.execute(
+        select(rollup.first_at)
+        .where(
+            rollup.resolution == resolution,
+            rollup.base_currency == base,
+            rollup.quote_currency == quote,
+        )
+        .order_by(rollup.bucket_start.asc())
+        .limit(1)
+    ).scalar()
+    return as_datetime(first_at) if first_at is not None else None
+
+
+def rollup_history(series, interval_seconds: int) -> list[dict]:
+    """Downsample a subquery of rollup buckets into ``interval_seconds`` OHLC buckets.
+
+    ``series`` has the rollup columns ``bucket_start``, ``open``, ``high``,
+    ``low``, ``close``, ``count`` and ``last_at``, at a resolution
+    ``interval_seconds`` is a whole multiple of.
+    """
+    bucket = bucket_epoch(series.c.bucket_start, interval_seconds).label("bucket")
+    by_bucket = {"partition_by": bucket}
+    windowed = select(
+        bucket,
+        series.c.high,
+        series.c.low,
+        series.c.count,
+        series.c.last_at,
+        func.first_value(series.c.open)
+        .over(order_by=series.c.bucket_start.asc(), **by_bucket)
+        .label("open"),
+        func.first_value(series.c.close)
+        .over(order_by=series.c.bucket_start.desc(), **by_bucket)
+        .label("close"),
+    ).subquery()
+    statement = (
+        select(
+            windowed.c.bucket,
+            func.min(windowed.c.open).label("open"),
+            func.max(windowed.c.high).label("high"),
+            func.min(windowed.c.low).label("low"),
+            func.min(windowed.c.close).label("close"),
+            func.max(windowed.c.last_at).label("last_fetched_at"),
+            func.sum(windowed.c.count).label("count"),
+        )
+        .group_by(windowed.c.bucket)
+        .order_by(windowed.c.bucket)
+    )
+    return [
+        {
+            "bucket": (_EPOCH + timedelta(seconds=row.bucket)).isoformat(),
+            "open": row.open,
+            "high": row.high,
+            "low": row.low,
+            "close": row.close,
+            "last_fetched_at": as_datetime(row.last_fetched_at).isoformat(),
+            "count": row.count,
+        }
+        for row in db.session.execute(statement)
+    ]
+
+
+def _aggregate_raw(seconds: int, start: datetime | None, end: datetime | None):
+    raw = CurrencyRate
+    bucket = bucket_epoch(raw.fetched_at, seconds).label("bucket")
+    partition = {"partition_by": (raw.base_currency, raw.quote_currency, bucket)}
+    windowed = select(
+        raw.base_currency,
+        raw.quote_currency,
+        bucket,
+        raw.rate,
+        raw.fetched_at,
+        func.first_value(raw.rate).over(order_by=raw.fetched_at.asc(), **partition).label("open"),
+        func.first_value(raw.rate).over(order_by=raw.fetched_at.desc(), **partition).label("close"),
+    )
+    if start is not None:
+        windowed = windowed.where(raw.fetched_at >= start)
+    if end is not None:
+        windowed = windowed.where(raw.fetched_at < end)
+    windowed = windowed.subquery()
+    return select(
+        windowed.c.base_currency,
+        windowed.c.quote_currency,
+        windowed.c.bucket,
+        func.min(windowed.c.open).label("open"),
+        func.max(windowed.c.rate).label("high"),
+        func.min(windowed.c.rate).label("low"),
+        func.min(windowed.c.close).label("close"),
+        func.count().label("count"),
+        func.min(windowed.c.fetched_at).label("first_at"),
+        func.max(windowed.c.fetched_at).label("last_at"),
+    ).group_by(windowed.c.base_currency, windowed.c.quote_currency, windowed.c.bucket)
+
+
+def _next_raw_day(after: datetime | None, end: datetime | None) -> datetime | None:
+    """Start of the first day at or after ``after`` and before ``end`` with raw rows."""
+    statement = select(func.min(CurrencyRate.fetched_at))
+    if after is not None:
+        statement = statement.where(CurrencyRate.fetched_at >= after)
+    if end is not None:
+        statement = statement.where(CurrencyRate.fetched_at < end)
+    first = db.session.execute(statement).scalar()
+    return bucket_start(as_datetime(first), RESOLUTIONS["1d"]) if first is not None else None
+
+
+def _upsert(values: list[dict], merge: bool) -> None:
+    statement = dialect_insert(CurrencyRateRollup)
+    if statement is None:
+        raise RuntimeError("Rollups need PostgreSQL or SQLite (INSERT ... ON CONFLICT).")
+    new = statement.excluded
+    current = CurrencyRateRollup.__table__.c
+    if merge:
+        # Fold the new aggregate into the stored one; opens and closes are
+        # chosen by timestamp so out-of-order batches still land correctly.
+        updates = {
+            "open": case((new.first_at < current.first_at, new.open), else_=current.open),
+            "close": case((new.last_at >= current.last_at, new.close), else_=current.close),
+            "high": greatest(current.high, new.high),
+            "low": least(current.low, new.low),
+            "count": current.count + new.count,
+            "first_at": least(current.first_at, new.first_at),
+            "last_at": greatest(current.last_at, new.last_at),
+        }
+    else:
+        updates = {
+            column: getattr(new, column)
+            for column in ("open", "high", "low", "close", "count", "first_at", "last_at")
+        }
+    statement = statement.on_conflict_do_update(
+        index_elements=["resolution", "base_currency", "quote_currency", "bucket_start"],
+        set_=updates,
+    )
+    db.session.execute(statement, values)
+
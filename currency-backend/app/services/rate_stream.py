@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import json
+import threading
+from datetime import datetime
+from queue import Full, Queue
+
+from .pubsub import pubsub_listener
+from .rate_provider import UPDATES_CHANNEL, Snapshot
+
+SUBSCRIBER_QUEUE_SIZE = 32
+
+
+class RateUpdateHub:
+    """Delivers published rate snapshots to every open stream in this process.
+
+    Each update is decoded once and handed to all subscriber queues; a
+    subscriber that falls behind has updates dropped rather than blocking
+    the others.
+    """
+
+    def __init__(self) -> None:
+        self._queues: set[Queue] = set()
+        self._lock = threading.Lock()
+        self._subscribed = False
+
+    def open(self) -> Queue:
+        queue: Queue = Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._queues.add(queue)
+            subscribe = not self._subscribed
+            self._subscribed = True
+        if subscribe:
+            pubsub_listener.subscribe(UPDATES_CHANNEL, self._dispatch)
+        return queue
+
+    def close(self, queue: Queue) -> None:
+        with self._lock:
+            self._queues.discard(queue)
+
+    def _dispatch(self, data: str) -> None:
+        payload = json.loads(data)
+        update = (
+            payload["base"],
+            Snapshot(payload["rates"], datetime.fromisoformat(payload["fetched_at"])),
+        )
+        with self._lock:
+            queues = list(self._queues)
+        for queue in queues:
+            try:
+                queue.put_nowait(update)
+            except Full:
+                pass
+
+
+rate_updates = RateUpdateHub()
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import atexit
+import threading
+from datetime import datetime
+
+from flask import Flask
+from sqlalchemy import insert
+
+from ..extensions import PerProcess, db
+from ..models import CurrencyRate
+from .rate_rollups import apply_rollups
+
+
+class SnapshotWriter:
+    """Buffers rate snapshot rows and writes them to the database in bulk.
+
+    Rows are flushed by a background thread once ``SNAPSHOT_FLUSH_SIZE``
+    rows are queued or ``SNAPSHOT_FLUSH_INTERVAL_SECONDS`` has passed, and
+    drained on interpreter shutdown. Each flush also folds its rows into the
+    OHLC rollups in the same transaction. Rows of a failed flush stay
+    buffered, up to ``SNAPSHOT_BUFFER_MAX_ROWS``, and are retried. With
+    ``SNAPSHOT_WRITER_ASYNC`` off every enqueue is written immediately, which
+    keeps tests deterministic.
+    """
+
+    def __init__(self) -> None:
+        self.app: Flask | None = None
+        self._rows: list[dict] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: PerProcess[threading.Thread] = PerProcess(self._start_thread)
+
+    def init_app(self, app: Flask) -> None:
+        if self.app is None:
+            atexit.register(self.close)
+        self.app = app
+        app.extensions["snapshot_writer"] = self
+
+    def enqueue(self, base: str, rates: dict[str, float], fetched_at: datetime) -> None:
+        rows = [
+            {"base_currency": base, "quote_currency": quote, "rate": rate, "fetched_at": fetched_at}
+            for quote, rate in rates.items()
+        ]
+        if not self.app.config["SNAPSHOT_WRITER_ASYNC"]:
+            self._write(rows)
+            return
+
+        self._ensure_thread()
+        with self._lock:
+            self._rows.extend(rows)
+            self._trim_locked()
+            full = len(self._rows) >= self.app.config["SNAPSHOT_FLUSH_SIZE"]
+        if full:
+            self._wakeup.set()
+
+    def flush(self) -> None:
+        with self._lock:
+            rows, self._rows = self._rows, []
+        if rows and not self._write(rows):
+            # Keep the rows for the next flush; anything enqueued meanwhile
+            # is newer, so they go back in front of it.
+            with self._lock:
+                self._rows[:0] = rows
+                self._trim_locked()
+
+    def _trim_locked(self) -> None:
+        overflow = len(self._rows) - self.app.config["SNAPSHOT_BUFFER_MAX_ROWS"]
+        if overflow > 0:
+            # The database is falling behind; drop the oldest rows rather
+            # than growing without bound.
+            del self._rows[:overflow]
+            self.app.logger.warning("Snapshot buffer full, dropped %d rows", overflow)
+
+    def close(self) -> None:
+        self._stopped.set()
+        self._wakeup.set()
+        if (thread := self._thread.peek()) is not None:
+            thread.join(timeout=self.app.config["SNAPSHOT_FLUSH_INTERVAL_SECONDS"] * 2)
+        if self.app is not None:
+            self.flush()
+
+    def _ensure_thread(self) -> None:
+        self._thread.get()
+
+    def _start_thread(self) -> threading.Thread:
+        with self._lock:
+            self._rows = []  # rows inherited from a parent process are its to write
+        thread = threading.Thread(target=self._run, name="snapshot-writer", daemon=True)
+        thread.start()
+        return thread
+
+    def _run(self) -> None:
+        interval = self.app.config["SNAPSHOT_FLUSH_INTERVAL_SECONDS"]
+        while not self._stopped.is_set():
+            self._wakeup.wait(interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def _write(self, rows: list[dict]) -> bool:
+        """Insert ``rows`` and fold them into the rollups; ``False`` if that failed."""
+        with self.app.app_context():
+            try:
+                # A single executemany-style INSERT; no ORM objects are built.
+                db.session.execute(insert(CurrencyRate), rows)
+                apply_rollups(rows)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                self.app.logger.exception("Failed to persist %d rate rows", len(rows))
+                return False
+            finally:
+                db.session.remove()
+        return True
+
+
+snapshot_writer = SnapshotWriter()
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import BigInteger, cast, func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from ..extensions import db
+
+
+def dialect_name() -> str:
+    return db.session.get_bind().dialect.name
+
+
+def dialect_insert(model):
+    """Return an INSERT supporting ``ON CONFLICT``, or ``None`` if unavailable."""
+    name = dialect_name()
+    if name == "postgresql":
+        return postgresql.insert(model)
+    if name == "sqlite":
+        return sqlite.insert(model)
+    return None
+
+
+def epoch_seconds(column):
+    """SQL expression for a timestamp column as whole seconds since the epoch."""
+    if dialect_name() == "sqlite":
+        return cast(func.strftime("%s", column), BigInteger)
+    return cast(func.floor(func.extract("epoch", column)), BigInteger)
+
+
+def bucket_epoch(column, interval_seconds: int):
+    """Epoch second at which ``column``'s ``interval_seconds`` bucket starts."""
+    epoch = epoch_seconds(column)
+    return epoch - epoch % interval_seconds
+
+
+def greatest(left, right):
+    # SQLite's multi-argument max() is its scalar GREATEST.
+    if dialect_name() == "sqlite":
+        return func.max(left, right)
+    return func.greatest(left, right)
+
+
+def least(left, right):
+    if dialect_name() == "sqlite":
+        return func.min(left, right)
+    return func.least(left, right)
+
+
+def as_datetime(value: datetime | str) -> datetime:
+    # SQLite hands back aggregates over subquery columns as plain strings.
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import base64
+import binascii
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+from ..models import TrackedPair
+
+
+def encode_cursor(item: TrackedPair) -> str:
+    """Opaque cursor pointing just past ``item`` in newest-first order."""
+    raw = f"{item.created_at.isoformat()}|{item.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, item_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), int(item_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("invalid cursor") from None
+
+
+def list_tracked_pairs(
+    limit: int,
+    cursor: str | None = None,
+    base: str | None = None,
+    quote: str | None = None,
+) -> tuple[list[TrackedPair], str | None]:
+    """Return one newest-first page of tracked pairs and the cursor for the next.
+
+    Pages are keyed on ``(created_at, id)`` rather than an offset, so each
+    page is a bounded range scan on ``ix_tracked_pairs_created_at_id`` no
+    matter how deep the client has paged.
+    """
+    query = TrackedPair.query
+    if base:
+        query = query.filter(TrackedPair.base_currency == base)
+    if quote:
+        query = query.filter(TrackedPair.quote_currency == quote)
+    if cursor:
+        query = query.filter(
+            tuple_(TrackedPair.created_at, TrackedPair.id) < tuple_(*decode_cursor(cursor))
+        )
+    # One extra row tells us whether another page exists without a COUNT.
+    items = (
+        query.order_by(TrackedPair.created_at.desc(), TrackedPair.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    return items, encode_cursor(items[-1])
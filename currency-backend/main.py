@@ -1,7 +1,9 @@
 from app import create_app
 
-app = create_app()
+# Password hashing processes import this module as "__mp_main__" when they
+# start; only the real entry point (or gunicorn's import) builds the app.
+if __name__ != "__mp_main__":
+    app = create_app()
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000)
-
@@ -0,0 +1,22 @@
+import signal
+
+from app import create_app
+from app.services.rate_refresher import RateRefresher
+from app.services.snapshot_writer import snapshot_writer
+
+app = create_app()
+
+
+def _stop(signum, frame):
+    # The default SIGTERM action skips atexit, which would lose buffered
+    # snapshot rows; leave run_forever through SystemExit instead.
+    raise SystemExit(0)
+
+
+if __name__ == "__main__":
+    signal.signal(signal.SIGTERM, _stop)
+    with app.app_context():
+        try:
+            RateRefresher.from_config().run_forever()
+        finally:
+            snapshot_writer.close()
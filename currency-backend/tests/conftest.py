@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import os
+
+import fakeredis
+import pytest
+
+# Config reads these at import time; a checkout without a .env still runs.
+for key, value in {
+    "REDIS_URL": "redis://localhost:6379/0",
+    "FREECURRENCY_API_URL": "https://upstream.invalid/v1/latest",
+    "FREECURRENCY_API_KEY": "test-key",
+    "DEFAULT_BASE": "USD",
+    "DEFAULT_SYMBOLS": "EUR,GBP",
+    "RATE_CACHE_TTL": "30",
+    "SESSION_TTL_SECONDS": "86400",
+    "DATABASE_URL": "sqlite:///:memory:",
+}.items():
+    os.environ.setdefault(key, value)
+
+from app import create_app  # noqa: E402
+from app import extensions  # noqa: E402
+from app.auth import token_cache  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.services.local_cache import snapshot_cache  # noqa: E402
+from app.services.quota import quota_budget  # noqa: E402
+
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(extensions.Redis, "from_url", lambda *args, **kwargs: client)
+    return client
+
+
+@pytest.fixture
+def app(redis_client):
+    app = create_app("testing")
+    # Process-wide singletons keep state between tests otherwise.
+    quota_budget._usage = None
+    snapshot_cache.clear()
+    token_cache.clear()
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import pytest
+
+from app.auth import (
+    REVOCATIONS_CHANNEL,
+    _token_key,
+    issue_token,
+    resolve_token,
+    revoke_token,
+    token_cache,
+)
+from app.extensions import db
+from app.models import User
+from app.services.pubsub import pubsub_listener
+
+
+@pytest.fixture
+def live(monkeypatch):
+    """Pretend this worker's revocation subscription is confirmed."""
+    monkeypatch.setattr(
+        pubsub_listener, "is_live", lambda channel: channel == REVOCATIONS_CHANNEL
+    )
+
+
+@pytest.fixture
+def users(app):
+    rows = [
+        User(name="Ada", email="ada@example.com", password_hash="x"),
+        User(name="Bo", email="bo@example.com", password_hash="x"),
+    ]
+    db.session.add_all(rows)
+    db.session.commit()
+    return rows
+
+
+def test_resolved_tokens_are_cached(app, live, redis_client):
+    token = issue_token(7)
+    assert resolve_token(token) == 7
+
+    # Served from the in-process cache without asking Redis.
+    redis_client.delete(_token_key(token))
+    assert resolve_token(token) == 7
+
+
+def test_nothing_is_cached_without_a_live_revocation_subscription(app, redis_client):
+    token = issue_token(7)
+    assert resolve_token(token) == 7
+    redis_client.delete(_token_key(token))
+    assert resolve_token(token) is None
+
+
+def test_revocation_evicts_the_cached_token(app, live):
+    token = issue_token(7)
+    assert resolve_token(token) == 7
+    revoke_token(token)
+    assert resolve_token(token) is None
+
+
+def test_lookup_racing_a_revocation_is_not_cached(app, live):
+    key = _token_key("raced")
+    generation = token_cache.generation()
+    token_cache.evict(_token_key("other"))
+    token_cache.put(key, 7, 30, generation)
+    assert token_cache.get(key) is None
+
+
+def test_subscription_reset_clears_the_cache(app, live):
+    token = issue_token(7)
+    token_cache.clear()
+    assert token_cache.get(_token_key(token)) is None
+
+
+def test_cache_is_bounded(app, live):
+    app.config["AUTH_TOKEN_CACHE_MAX_ENTRIES"] = 2
+    tokens = [issue_token(user_id) for user_id in range(3)]
+    assert token_cache.get(_token_key(tokens[0])) is None
+    assert token_cache.get(_token_key(tokens[2])) == 2
+
+
+def test_session_slides_once_below_the_renewal_threshold(app, redis_client):
+    app.config.update(SESSION_TTL_SECONDS=3600, SESSION_RENEW_BELOW_SECONDS=600)
+    token = issue_token(7)
+    redis_client.expire(_token_key(token), 300)
+
+    assert resolve_token(token) == 7
+    assert redis_client.ttl(_token_key(token)) > 3000
+
+
+def test_unknown_or_malformed_tokens_resolve_to_none(app, redis_client):
+    assert resolve_token("missing") is None
+    redis_client.set(_token_key("garbled"), "not-a-user-id")
+    assert resolve_token("garbled") is None
+
+
+def test_required_auth_scopes_user_routes(app, client, users):
+    app.config["AUTH_REQUIRED"] = True
+    ada, bo = users
+    own = {"Authorization": f"Bearer {issue_token(ada.id)}"}
+    other = {"Authorization": f"Bearer {issue_token(bo.id)}"}
+    path = f"/api/users/{ada.id}/favorites"
+
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers=other).status_code == 403
+    assert client.get(path, headers=own).status_code == 200
+
+
+def test_logout_revokes_the_token(app, client, users, live):
+    headers = {"Authorization": f"Bearer {issue_token(users[0].id)}"}
+    assert client.post("/api/auth/logout", headers=headers).status_code == 200
+    assert resolve_token(headers["Authorization"].split()[1]) is None
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import pytest
+
+from app.services import rate_provider
+from app.services.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    OPEN_KEY,
+    PROBE_KEY,
+    CircuitOpen,
+    upstream_breaker,
+)
+from app.services.quota import QuotaExhausted, quota_budget
+from app.services.rate_provider import RateProvider
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, data: dict | None = None) -> None:
+        self.status_code = status_code
+        self._data = data or {}
+
+    def raise_for_status(self) -> None:
+        pass
+
+    def json(self) -> dict:
+        return {"data": self._data}
+
+
+@pytest.fixture
+def breaker(app):
+    app.config.update(
+        BREAKER_FAILURE_THRESHOLD=2, BREAKER_OPEN_SECONDS=30, BREAKER_SLOW_CALL_SECONDS=5
+    )
+    upstream_breaker.init_app(app)
+    return upstream_breaker
+
+
+def trip(breaker) -> None:
+    breaker.record(0.1, ok=False)
+    breaker.record(0.1, ok=False)
+
+
+def half_open(breaker, redis_client) -> None:
+    trip(breaker)
+    # Stands in for BREAKER_OPEN_SECONDS passing.
+    redis_client.delete(OPEN_KEY)
+
+
+def test_closed_circuit_admits_calls(breaker):
+    assert breaker.state() == CLOSED
+    breaker.check()
+    assert breaker.before_call() is None
+
+
+def test_consecutive_failures_open_the_circuit(breaker):
+    breaker.record(0.1, ok=False)
+    assert breaker.state() == CLOSED
+    breaker.record(0.1, ok=False)
+    assert breaker.state() == OPEN
+    with pytest.raises(CircuitOpen) as raised:
+        breaker.before_call()
+    assert 0 < raised.value.retry_after <= 30
+    with pytest.raises(CircuitOpen):
+        breaker.check()
+
+
+def test_slow_calls_count_as_failures(breaker):
+    breaker.record(6, ok=True)
+    breaker.record(6, ok=True)
+    assert breaker.state() == OPEN
+
+
+def test_success_resets_the_failure_count(breaker):
+    breaker.record(0.1, ok=False)
+    breaker.record(0.1, ok=True)
+    breaker.record(0.1, ok=False)
+    assert breaker.state() == CLOSED
+
+
+def test_half_open_admits_a_single_probe(breaker, redis_client):
+    half_open(breaker, redis_client)
+    assert breaker.state() == HALF_OPEN
+
+    breaker.check()
+    assert breaker.before_call() is not None
+    with pytest.raises(CircuitOpen):
+        breaker.check()
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+
+    breaker.record(0.1, ok=True)
+    assert breaker.state() == CLOSED
+    assert not redis_client.exists(PROBE_KEY)
+
+
+def test_failed_probe_reopens_the_circuit(breaker, redis_client):
+    half_open(breaker, redis_client)
+    breaker.before_call()
+    breaker.record(0.1, ok=False)
+    assert breaker.state() == OPEN
+    assert not redis_client.exists(PROBE_KEY)
+
+
+def test_released_probe_can_be_taken_again(breaker, redis_client):
+    half_open(breaker, redis_client)
+    token = breaker.before_call()
+
+    breaker.release_probe("someone-else")
+    assert redis_client.exists(PROBE_KEY)
+
+    breaker.release_probe(token)
+    assert breaker.before_call() is not None
+
+
+def test_quota_refusal_leaves_the_probe_free(app, breaker, redis_client, monkeypatch):
+    half_open(breaker, redis_client)
+    app.config["UPSTREAM_QUOTA_PER_MONTH"] = 1
+    quota_budget.init_app(app)
+    assert quota_budget.try_acquire()
+    monkeypatch.setattr(rate_provider, "upstream_get", pytest.fail)
+
+    with pytest.raises(QuotaExhausted):
+        RateProvider(30)._fetch_upstream("USD")
+
+    assert not redis_client.exists(PROBE_KEY)
+    assert breaker.state() == HALF_OPEN
+
+
+def test_upstream_probe_closes_the_circuit(breaker, redis_client, monkeypatch):
+    half_open(breaker, redis_client)
+    monkeypatch.setattr(
+        rate_provider, "upstream_get", lambda url, params: FakeResponse(200, {"EUR": 0.9})
+    )
+
+    snapshot = RateProvider(30)._fetch_upstream("USD")
+
+    assert snapshot.rates == {"EUR": 0.9}
+    assert breaker.state() == CLOSED
+
+
+def test_client_errors_do_not_trip_the_circuit(breaker, monkeypatch):
+    monkeypatch.setattr(rate_provider, "upstream_get", lambda url, params: FakeResponse(422))
+    for _ in range(3):
+        RateProvider(30)._fetch_upstream("ZZZ")
+    assert breaker.state() == CLOSED
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+import pytest
+
+from app.extensions import db
+from app.models import CurrencyRate
+from app.services.quota import QuotaExhausted, quota_budget
+from app.services.rate_provider import RateProvider
+
+
+def limit(app, per_minute: int = 0, per_month: int = 0) -> None:
+    app.config.update(UPSTREAM_QUOTA_PER_MINUTE=per_minute, UPSTREAM_QUOTA_PER_MONTH=per_month)
+    quota_budget.init_app(app)
+    quota_budget._usage = None
+
+
+def used(redis_client) -> tuple[int, int]:
+    minute_key, month_key = quota_budget._keys(datetime.utcnow())
+    minute, month = redis_client.mget(minute_key, month_key)
+    return int(minute or 0), int(month or 0)
+
+
+def test_unlimited_without_configured_quota(app):
+    limit(app)
+    assert all(quota_budget.try_acquire() for _ in range(20))
+    assert quota_budget.headroom() is None
+
+
+def test_minute_window_is_enforced(app, redis_client):
+    limit(app, per_minute=2)
+    assert quota_budget.try_acquire()
+    assert quota_budget.try_acquire()
+    assert not quota_budget.try_acquire()
+    assert used(redis_client) == (2, 2)
+    assert quota_budget.headroom() == 0
+
+
+def test_refused_call_counts_against_neither_window(app, redis_client):
+    limit(app, per_minute=10, per_month=1)
+    assert quota_budget.try_acquire()
+    assert not quota_budget.try_acquire()
+    assert used(redis_client) == (1, 1)
+    assert quota_budget.retry_after() > 60
+
+
+def test_effective_ttl_stretches_to_fit_the_minute_budget(app):
+    limit(app, per_minute=1)
+    # Three bases at one call per minute can each be refreshed every 180s.
+    assert quota_budget.effective_ttl(30, 600, lambda: 3) == 180
+    quota_budget._usage = None
+    assert quota_budget.effective_ttl(30, 600, lambda: 100) == 600
+
+
+def test_spent_month_serves_until_the_hard_ttl(app):
+    limit(app, per_month=1)
+    assert quota_budget.try_acquire()
+    quota_budget._usage = None
+    assert quota_budget.effective_ttl(30, 600, lambda: 1) == 600
+
+
+def test_spent_quota_falls_back_to_the_persisted_snapshot(app):
+    limit(app, per_month=1)
+    assert quota_budget.try_acquire()
+    fetched_at = datetime(2024, 5, 1, 10, 0, 0)
+    db.session.add(
+        CurrencyRate(base_currency="USD", quote_currency="EUR", rate=0.9, fetched_at=fetched_at)
+    )
+    db.session.commit()
+
+    [rate] = RateProvider(30).get_rates([("USD", "EUR")])
+
+    assert rate["rate"] == 0.9
+    assert rate["stale"] is True
+    assert rate["fetched_at"] == fetched_at.isoformat()
+
+
+def test_spent_quota_without_persisted_snapshot_is_refused(app, client):
+    limit(app, per_month=1)
+    assert quota_budget.try_acquire()
+
+    with pytest.raises(QuotaExhausted):
+        RateProvider(30).get_rates([("USD", "EUR")])
+
+    response = client.get("/api/rates", query_string={"pairs": "USD:EUR"})
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) > 0
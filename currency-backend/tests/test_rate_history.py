@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.extensions import db
+from app.models import CurrencyRate
+from app.services.rate_history import parse_interval, query_history
+
+T0 = datetime(2024, 5, 1, 10, 0, 0)
+
+
+def at(seconds: int) -> datetime:
+    return T0 + timedelta(seconds=seconds)
+
+
+def store(base: str, quote: str, rate: float, fetched_at: datetime) -> dict:
+    row = {"base_currency": base, "quote_currency": quote, "rate": rate, "fetched_at": fetched_at}
+    db.session.add(CurrencyRate(**row))
+    return row
+
+
+def test_parse_interval():
+    assert parse_interval("30s") == 30
+    assert parse_interval("5M") == 300
+    assert parse_interval("1d") == 86400
+    for raw in ("0m", "1w", "m5", ""):
+        with pytest.raises(ValueError):
+            parse_interval(raw)
+
+
+def test_raw_history_buckets_ohlc(app):
+    store("USD", "EUR", 1.0, at(10))
+    store("USD", "EUR", 1.2, at(40))
+    store("USD", "EUR", 0.9, at(50))
+    store("USD", "EUR", 1.1, at(65))
+    db.session.commit()
+
+    buckets = query_history("USD", "EUR", at(0), at(120), 60)
+
+    assert [bucket["bucket"] for bucket in buckets] == [at(0).isoformat(), at(60).isoformat()]
+    first, second = buckets
+    assert (first["open"], first["high"], first["low"], first["close"]) == (1.0, 1.2, 0.9, 0.9)
+    assert first["count"] == 3
+    assert first["last_fetched_at"] == at(50).isoformat()
+    assert (second["open"], second["close"], second["count"]) == (1.1, 1.1, 1)
+
+
+def test_cross_pair_history_is_derived_from_pivot_legs(app):
+    store("USD", "EUR", 0.5, at(10))
+    store("USD", "GBP", 0.25, at(10))
+    db.session.commit()
+
+    [bucket] = query_history("EUR", "GBP", at(0), at(60), 60)
+
+    assert bucket["open"] == pytest.approx(0.5)
+    assert bucket["count"] == 1
+
+
+def test_history_rejects_too_many_buckets(app):
+    app.config["HISTORY_MAX_BUCKETS"] = 10
+    with pytest.raises(ValueError):
+        query_history("USD", "EUR", at(0), at(3600), 60)
+
+
+def test_history_endpoint(client):
+    store("USD", "EUR", 1.0, at(10))
+    db.session.commit()
+
+    window = {"from": at(0).isoformat(), "to": at(60).isoformat()}
+    response = client.get(
+        "/api/rates/history", query_string={"pair": "USD:EUR", "interval": "1m", **window}
+    )
+    assert response.status_code == 200
+    assert [bucket["close"] for bucket in response.get_json()["data"]] == [1.0]
+
+    for query in ({"pair": "USD:EUR", "interval": "1w"}, {"pair": "USD"}):
+        assert client.get("/api/rates/history", query_string=query).status_code == 400
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import pytest
+import requests
+
+from app.services import rate_provider
+from app.services.rate_provider import DEMAND_KEY, RateProvider
+from app.services.rate_refresher import RateRefresher
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, data: dict | None = None) -> None:
+        self.status_code = status_code
+        self._data = data or {}
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise requests.HTTPError(str(self.status_code), response=self)
+
+    def json(self) -> dict:
+        return {"data": self._data}
+
+
+@pytest.fixture
+def upstream_calls(app, monkeypatch):
+    """Record upstream calls by base; upstream rejects ``ZZZ`` and quotes the rest."""
+    app.config["RATE_TRIANGULATION"] = False
+    calls: list[str] = []
+
+    def fake_get(url: str, params: dict) -> FakeResponse:
+        calls.append(params["base_currency"])
+        if params["base_currency"] == "ZZZ":
+            return FakeResponse(422)
+        return FakeResponse(200, {"EUR": 0.9})
+
+    monkeypatch.setattr(rate_provider, "upstream_get", fake_get)
+    return calls
+
+
+def test_unknown_base_is_never_recorded_as_demand(app, redis_client, upstream_calls):
+    with pytest.raises(requests.HTTPError):
+        RateProvider(30).get_rates([("ZZZ", "USD")])
+    RateProvider(30).get_rates([("GBP", "EUR")])
+
+    assert redis_client.zrange(DEMAND_KEY, 0, -1) == ["GBP"]
+
+
+def test_refresher_stops_polling_a_rejected_base(app, redis_client, upstream_calls):
+    redis_client.zadd(DEMAND_KEY, {"ZZZ": 1e12})
+    refresher = RateRefresher(
+        RateProvider(30), lead_seconds=5, interval_seconds=1, demand_window_seconds=3600
+    )
+
+    for _ in range(3):
+        refresher.run_once()
+
+    assert upstream_calls.count("ZZZ") == 1
+    assert "ZZZ" not in redis_client.zrange(DEMAND_KEY, 0, -1)
+    # The default base stays warm.
+    assert upstream_calls.count("USD") == 1
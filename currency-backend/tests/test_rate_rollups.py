@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from app.extensions import db
+from app.models import CurrencyRate, CurrencyRateRollup
+from app.services.rate_history import query_history
+from app.services.rate_rollups import apply_rollups, backfill_rollups
+
+T0 = datetime(2024, 5, 1, 10, 0, 0)
+
+
+def at(seconds: int) -> datetime:
+    return T0 + timedelta(seconds=seconds)
+
+
+def store(rate: float, fetched_at: datetime) -> dict:
+    row = {"base_currency": "USD", "quote_currency": "EUR", "rate": rate, "fetched_at": fetched_at}
+    db.session.add(CurrencyRate(**row))
+    return row
+
+
+def rollup(resolution: str, bucket: datetime) -> CurrencyRateRollup:
+    return CurrencyRateRollup.query.filter_by(
+        resolution=resolution, base_currency="USD", quote_currency="EUR", bucket_start=bucket
+    ).one()
+
+
+def test_apply_rollups_merges_out_of_order_batches(app):
+    later = [store(1.3, at(40)), store(1.1, at(50))]
+    apply_rollups(later)
+    earlier = [store(1.0, at(20))]
+    apply_rollups(earlier)
+    db.session.commit()
+
+    minute = rollup("1m", at(0))
+    assert (minute.open, minute.high, minute.low, minute.close) == (1.0, 1.3, 1.0, 1.1)
+    assert minute.count == 3
+    assert (minute.first_at, minute.last_at) == (at(20), at(50))
+    assert rollup("1d", datetime(2024, 5, 1)).count == 3
+
+
+def test_history_is_served_from_rollups_after_compaction(app):
+    apply_rollups([store(1.0, at(10)), store(1.4, at(70))])
+    db.session.commit()
+    CurrencyRate.query.delete()
+    db.session.commit()
+
+    [bucket] = query_history("USD", "EUR", at(0), at(3600), 3600)
+
+    assert (bucket["open"], bucket["high"], bucket["close"], bucket["count"]) == (1.0, 1.4, 1.4, 2)
+
+
+def test_backfill_rollups_is_idempotent(app):
+    for offset, rate in ((10, 1.0), (20, 1.2), (3700, 1.1)):
+        store(rate, at(offset))
+    db.session.commit()
+
+    written = backfill_rollups()
+    assert written == backfill_rollups()
+
+    hour = rollup("1h", at(0))
+    assert (hour.open, hour.high, hour.close, hour.count) == (1.0, 1.2, 1.2, 2)
+    assert rollup("1d", datetime(2024, 5, 1)).count == 3
+    assert CurrencyRateRollup.query.count() == written
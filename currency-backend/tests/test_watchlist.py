@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.extensions import db
+from app.models import TrackedPair
+from app.services.watchlist import decode_cursor, encode_cursor, list_tracked_pairs
+
+T0 = datetime(2024, 5, 1, 10, 0, 0)
+
+
+@pytest.fixture
+def pairs(app):
+    # Three pairs share a timestamp so pages must break ties on id.
+    rows = [
+        TrackedPair(base_currency="USD", quote_currency="EUR", created_at=T0),
+        TrackedPair(base_currency="USD", quote_currency="GBP", created_at=T0),
+        TrackedPair(base_currency="USD", quote_currency="JPY", created_at=T0),
+        TrackedPair(base_currency="EUR", quote_currency="GBP", created_at=T0 + timedelta(minutes=1)),
+        TrackedPair(base_currency="GBP", quote_currency="USD", created_at=T0 - timedelta(minutes=1)),
+    ]
+    db.session.add_all(rows)
+    db.session.commit()
+    return rows
+
+
+def newest_first(rows: list[TrackedPair]) -> list[int]:
+    return [row.id for row in sorted(rows, key=lambda row: (row.created_at, row.id), reverse=True)]
+
+
+def test_pages_cover_every_pair_once_in_order(pairs):
+    seen: list[int] = []
+    cursor = None
+    while True:
+        items, cursor = list_tracked_pairs(2, cursor=cursor)
+        assert len(items) <= 2
+        seen.extend(item.id for item in items)
+        if cursor is None:
+            break
+    assert seen == newest_first(pairs)
+
+
+def test_last_full_page_has_no_cursor(pairs):
+    items, cursor = list_tracked_pairs(len(pairs))
+    assert len(items) == len(pairs)
+    assert cursor is None
+
+
+def test_filters_apply_before_paging(pairs):
+    items, cursor = list_tracked_pairs(10, base="USD")
+    assert [item.quote_currency for item in items] == ["JPY", "GBP", "EUR"]
+    assert cursor is None
+
+    items, _ = list_tracked_pairs(10, base="USD", quote="GBP")
+    assert [(item.base_currency, item.quote_currency) for item in items] == [("USD", "GBP")]
+
+
+def test_cursor_round_trip(pairs):
+    assert decode_cursor(encode_cursor(pairs[0])) == (T0, pairs[0].id)
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_watchlist_endpoint_pages(client, pairs):
+    first = client.get("/api/watchlist", query_string={"limit": 3}).get_json()
+    second = client.get(
+        "/api/watchlist", query_string={"limit": 3, "cursor": first["next_cursor"]}
+    ).get_json()
+
+    ids = [item["id"] for item in first["data"] + second["data"]]
+    assert ids == newest_first(pairs)
+    assert second["next_cursor"] is None
+
+
+@pytest.mark.parametrize(
+    "query", [{"limit": 0}, {"limit": "ten"}, {"limit": 100000}, {"cursor": "garbage"}]
+)
+def test_watchlist_endpoint_rejects_bad_paging(client, pairs, query):
+    assert client.get("/api/watchlist", query_string=query).status_code == 400